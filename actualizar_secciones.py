@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import time
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from recomendador import secciones, construir_matriz_compras
+from registro_modelos import huella_archivo
+from datos import cargar_transacciones
+from artefactos import cargar_artefactos, cargar_facturas, cargar_manifiesto, guardar_artefactos, DIRECTORIO_ARTEFACTOS
+
+# Actualización incremental de los modelos de cada sección con facturas nuevas.
+# Las compras nuevas se agregan a la matriz guardada en los artefactos (filas nuevas para facturas nuevas,
+# sumando a la fila existente si la factura ya estaba) y solo se recalculan los factores afectados:
+#   - 'parcial': partial_fit_users de las facturas tocadas y partial_fit_items de los productos tocados,
+#     con un costo proporcional a las facturas nuevas;
+#   - 'tibio': un fit corto sobre toda la matriz partiendo de los factores anteriores.
+# El resultado se guarda como una nueva versión de los artefactos.
+#
+# Uso: python actualizar_secciones.py --nuevas facturas_nuevas.csv [--datos datos.csv] [--modo parcial|tibio]
+
+MODOS = ('parcial', 'tibio')
+
+
+# Agregar las compras de df_nuevas a la matriz facturas×productos.
+# Con agregar_productos=False se descartan los productos que no están en el modelo (p. ej. fuera del top 200).
+# Devuelve (matriz, facturas, productos, filas_afectadas, columnas_afectadas)
+def ampliar_matriz(matriz, facturas, productos, df_nuevas, agregar_productos=False):
+    if not agregar_productos:
+        df_nuevas = df_nuevas[df_nuevas['COD_PRODUCTO'].isin(productos)]
+    delta, facturas_delta, productos_delta = construir_matriz_compras(df_nuevas)
+
+    facturas = facturas.append(facturas_delta.difference(facturas))
+    productos = productos.append(productos_delta.difference(productos))
+    filas = facturas.get_indexer(facturas_delta)
+    columnas = productos.get_indexer(productos_delta)
+    forma = (len(facturas), len(productos))
+
+    delta = delta.tocoo()
+    delta = coo_matrix((delta.data, (filas[delta.row], columnas[delta.col])), shape=forma).tocsr()
+    # Las facturas nuevas quedan al final como filas vacías de la matriz anterior
+    indptr = np.concatenate([matriz.indptr, np.full(forma[0] - matriz.shape[0], matriz.indptr[-1])])
+    matriz = (csr_matrix((matriz.data, matriz.indices, indptr), shape=forma) + delta).tocsr()
+    matriz.eliminate_zeros()
+    return matriz, facturas, productos, np.unique(filas), np.unique(columnas)
+
+
+# Copiar los factores (los artefactos están mapeados en solo lectura) e iniciar las filas de facturas y
+# productos nuevos con valores pequeños al azar, como hace fit; con ceros, una factura que solo tiene
+# productos nuevos y esos productos se anularían entre sí y nunca saldrían de cero
+def _ampliar_factores(factores, filas, semilla=42):
+    ampliados = np.random.default_rng(semilla).random((filas, factores.shape[1]), dtype=factores.dtype) * 0.01
+    ampliados[:len(factores)] = factores
+    return ampliados
+
+
+# Recalcular los factores del modelo tras ampliar la matriz
+def actualizar_modelo(als_model, matriz, filas_afectadas, columnas_afectadas, modo='parcial', pasadas=1, iteraciones=5):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de actualización desconocido: {modo}")
+    als_model.user_factors = _ampliar_factores(als_model.user_factors, matriz.shape[0])
+    als_model.item_factors = _ampliar_factores(als_model.item_factors, matriz.shape[1])
+    if modo == 'tibio':
+        iteraciones_originales = als_model.iterations
+        als_model.iterations = iteraciones
+        try:
+            als_model.fit(matriz, show_progress=False)
+        finally:
+            als_model.iterations = iteraciones_originales
+        return als_model
+
+    if len(filas_afectadas) == 0:
+        return als_model
+    matriz_productos = matriz.T.tocsr()
+    for _ in range(pasadas):
+        als_model.partial_fit_users(filas_afectadas, matriz[filas_afectadas])
+        als_model.partial_fit_items(columnas_afectadas, matriz_productos[columnas_afectadas])
+    return als_model
+
+
+# Actualizar la versión vigente de una sección y guardarla como una versión nueva.
+# Devuelve la ruta de la versión nueva, o None si no hay artefactos actualizables o compras nuevas
+def actualizar_seccion(seccion, df_nuevas, huella, directorio=DIRECTORIO_ARTEFACTOS, modo='parcial', agregar_productos=False,
+                       pasadas=1, iteraciones=5):
+    manifiesto = cargar_manifiesto(seccion, directorio)
+    modelo = cargar_artefactos(seccion, directorio=directorio)
+    facturas = cargar_facturas(seccion, directorio)
+    if modelo is None or facturas is None or df_nuevas.empty:
+        return None
+    productos, als_model, matriz = modelo
+
+    matriz, facturas, productos, filas, columnas = ampliar_matriz(matriz, facturas, productos, df_nuevas, agregar_productos)
+    if len(filas) == 0:
+        # Ninguna compra nueva de productos del modelo: la versión vigente sigue siendo válida
+        return None
+    als_model = actualizar_modelo(als_model, matriz, filas, columnas, modo, pasadas, iteraciones)
+    origen = {
+        'version_previa': manifiesto['version'],
+        'modo': modo,
+        'facturas_actualizadas': int(len(filas)),
+        'productos_actualizados': int(len(columnas))
+    }
+    return guardar_artefactos(seccion, productos, als_model, matriz, huella, manifiesto['hiperparametros'], directorio,
+                              facturas, origen, manifiesto.get('top_productos'))
+
+
+# Huella de los datos actualizados cuando no se indica el datos.csv completo: combina la huella previa con la del delta
+def combinar_huellas(huella_previa, huella_nuevas):
+    return hashlib.sha1(f'{huella_previa}+{huella_nuevas}'.encode()).hexdigest()[:16]
+
+
+def actualizar_todas(ruta_nuevas, ruta_datos=None, directorio=DIRECTORIO_ARTEFACTOS, modo='parcial', agregar_productos=False):
+    df_nuevas = cargar_transacciones(ruta_nuevas, usar_cache=False)
+    huella_datos = huella_archivo(ruta_datos) if ruta_datos else None
+    resultados = {}
+    for categoria, seccion in secciones.items():
+        manifiesto = cargar_manifiesto(seccion, directorio)
+        if manifiesto is None:
+            print(f"{categoria} (sección {seccion}): sin artefactos, se omite.")
+            continue
+        huella = huella_datos or combinar_huellas(manifiesto['huella_datos'], huella_archivo(ruta_nuevas))
+        inicio = time.time()
+        destino = actualizar_seccion(seccion, df_nuevas[df_nuevas['SECCION'] == seccion], huella, directorio, modo,
+                                     agregar_productos)
+        if destino is None:
+            print(f"{categoria} (sección {seccion}): sin compras nuevas o artefactos sin facturas "
+                  f"(reentrenar con entrenar_secciones.py), se omite.")
+            continue
+        resultados[seccion] = destino
+        print(f"{categoria} (sección {seccion}): {time.time() - inicio:.2f} s -> {destino}")
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Actualiza los modelos ALS de cada sección con facturas nuevas.")
+    parser.add_argument('--nuevas', required=True, help="CSV con las transacciones nuevas (mismo formato que datos.csv)")
+    parser.add_argument('--datos', help="datos.csv completo ya actualizado; su huella se registra en los artefactos")
+    parser.add_argument('--salida', default=DIRECTORIO_ARTEFACTOS, help="Directorio de artefactos")
+    parser.add_argument('--modo', choices=MODOS, default='parcial', help="Actualización parcial o fit corto desde los factores previos")
+    parser.add_argument('--agregar-productos', action='store_true', help="Incorporar productos que no estaban en el modelo")
+    args = parser.parse_args()
+    actualizar_todas(args.nuevas, args.datos, args.salida, args.modo, args.agregar_productos)
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit, parse_qs
+from instrumentacion import solicitud, exportar_prometheus
+from servicio import ServicioCombos, combos_a_registros
+from recomendador import secciones
+
+# API HTTP/JSON del recomendador de combos, independiente de Streamlit, con asyncio de la biblioteca estándar.
+#
+#   GET /combos?section=24&products=24001,24002[&n=5]   combos de los productos con precio, margen y estimaciones
+#   GET /productos?section=24                           productos del modelo de la sección
+#   GET /salud                                          estado del servicio
+#   GET /metricas                                       tiempos por etapa en formato de Prometheus
+#
+# Las consultas de /combos que llegan casi a la vez se agrupan en un lote (hasta max_lote consultas o espera_ms)
+# y se resuelven juntas en un hilo, con un cálculo por sección. Como máximo max_concurrencia solicitudes se
+# atienden a la vez; si además hay más de max_espera esperando, se responde 503.
+#
+# Uso: python api.py [--host 127.0.0.1] [--puerto 8000]
+
+MAX_N = 50
+
+ESTADOS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+class AgrupadorConsultas:
+
+    def __init__(self, procesar, max_lote=64, espera_ms=2):
+        self._procesar = procesar
+        self._max_lote = max_lote
+        self._espera = espera_ms / 1000
+        self._cola = asyncio.Queue()
+        self._tarea = None
+
+    def iniciar(self):
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def consultar(self, consulta):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._cola.put((consulta, futuro))
+        return await futuro
+
+    async def _bucle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            limite = loop.time() + self._espera
+            while len(lote) < self._max_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            # El lote se resuelve aparte para seguir juntando el siguiente mientras tanto
+            asyncio.create_task(self._resolver(lote))
+
+    async def _resolver(self, lote):
+        try:
+            resultados = await asyncio.get_running_loop().run_in_executor(None, self._procesar, [consulta for consulta, _ in lote])
+        except Exception as error:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(error)
+        else:
+            for (_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+
+class ServidorCombos:
+
+    def __init__(self, servicio, max_concurrencia=64, max_espera=256, max_lote=64, espera_ms=2):
+        self.servicio = servicio
+        self.max_espera = max_espera
+        self._max_concurrencia = max_concurrencia
+        self._max_lote = max_lote
+        self._espera_ms = espera_ms
+        self._limite = None
+        self._agrupador = None
+        self._en_espera = 0
+        self.inicio = time.time()
+        self.atendidas = 0
+
+    async def iniciar(self, host='127.0.0.1', puerto=8000):
+        self._limite = asyncio.Semaphore(self._max_concurrencia)
+        self._agrupador = AgrupadorConsultas(self._combos_lote, self._max_lote, self._espera_ms)
+        self._agrupador.iniciar()
+        return await asyncio.start_server(self._atender, host, puerto)
+
+    # Resolver un lote de consultas (seccion, productos, n) con el mayor n del lote y recortar cada respuesta a su n
+    def _combos_lote(self, consultas):
+        N = max(n for _, _, n in consultas)
+        resultados = self.servicio.combos_lote([(seccion, productos) for seccion, productos, _ in consultas], N)
+        return [
+            {'section': seccion, 'combos': combos_a_registros(resultado['combos'].groupby('COD_PRODUCTO_A', sort=False).head(n)),
+             'missing': resultado['faltantes']}
+            for (seccion, _, n), resultado in zip(consultas, resultados)
+        ]
+
+    async def _responder(self, metodo, objetivo):
+        if metodo != 'GET':
+            return 405, {'error': 'Solo se admite GET'}
+        partes = urlsplit(objetivo)
+        parametros = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+        if partes.path == '/salud':
+            return 200, {'estado': 'ok', 'secciones_cargadas': self.servicio.secciones_cargadas,
+                         'segundos_activo': time.time() - self.inicio, 'atendidas': self.atendidas}
+        if partes.path == '/metricas':
+            return 200, exportar_prometheus()
+        try:
+            seccion = int(parametros['section'])
+        except (KeyError, ValueError):
+            return 400, {'error': "Falta el parámetro entero 'section'"}
+        if seccion not in secciones.values():
+            return 404, {'error': f'Sección desconocida: {seccion}'}
+        if partes.path == '/productos':
+            productos = await asyncio.get_running_loop().run_in_executor(None, self.servicio.productos, seccion)
+            return 200, {'section': seccion, 'products': productos}
+        if partes.path == '/combos':
+            try:
+                productos = [int(producto) for producto in parametros.get('products', '').split(',') if producto]
+                n = int(parametros.get('n', self.servicio.N))
+            except ValueError:
+                return 400, {'error': "'products' debe ser una lista de códigos separados por comas y 'n' un entero"}
+            if not productos:
+                return 400, {'error': "Falta el parámetro 'products'"}
+            if not 1 <= n <= MAX_N:
+                return 400, {'error': f"'n' debe estar entre 1 y {MAX_N}"}
+            return 200, await self._agrupador.consultar((seccion, productos, n))
+        return 404, {'error': f'Ruta desconocida: {partes.path}'}
+
+    async def _procesar(self, metodo, objetivo):
+        if self._en_espera >= self.max_espera:
+            return 503, {'error': 'Servicio saturado, reintente más tarde'}
+        self._en_espera += 1
+        try:
+            await self._limite.acquire()
+        finally:
+            self._en_espera -= 1
+        try:
+            with solicitud('api'):
+                return await self._responder(metodo, objetivo)
+        except Exception as error:
+            return 500, {'error': f'{type(error).__name__}: {error}'}
+        finally:
+            self._limite.release()
+            self.atendidas += 1
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                metodo, objetivo, version = linea.decode('latin-1').split()
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    clave, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[clave.strip().lower()] = valor.strip()
+                if 'content-length' in cabeceras:
+                    await lector.readexactly(int(cabeceras['content-length']))
+
+                estado, contenido = await self._procesar(metodo, objetivo)
+                if isinstance(contenido, str):
+                    cuerpo, tipo = contenido.encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    cuerpo, tipo = json.dumps(contenido, ensure_ascii=False).encode('utf-8'), 'application/json'
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                escritor.write(
+                    f'HTTP/1.1 {estado} {ESTADOS[estado]}\r\n'
+                    f'Content-Type: {tipo}; charset=utf-8\r\n'
+                    f'Content-Length: {len(cuerpo)}\r\n'
+                    f'Connection: {"keep-alive" if mantener else "close"}\r\n\r\n'.encode('latin-1') + cuerpo
+                )
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+
+async def servir(host, puerto, **opciones):
+    servicio = await asyncio.get_running_loop().run_in_executor(None, ServicioCombos)
+    servidor = await ServidorCombos(servicio, **opciones).iniciar(host, puerto)
+    print(f"Sirviendo en http://{host}:{puerto} (secciones cargadas: {servicio.secciones_cargadas})")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="API HTTP/JSON del recomendador de combos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--max-concurrencia', type=int, default=64, help="Solicitudes atendidas a la vez")
+    parser.add_argument('--max-espera', type=int, default=256, help="Solicitudes en espera antes de responder 503")
+    parser.add_argument('--max-lote', type=int, default=64, help="Consultas de /combos agrupadas por lote")
+    parser.add_argument('--espera-ms', type=float, default=2, help="Tiempo máximo para juntar un lote")
+    args = parser.parse_args()
+    try:
+        asyncio.run(servir(args.host, args.puerto, max_concurrencia=args.max_concurrencia, max_espera=args.max_espera,
+                           max_lote=args.max_lote, espera_ms=args.espera_ms))
+    except KeyboardInterrupt:
+        pass
@@ -1,82 +1,58 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import gdown
-from scipy.sparse import csr_matrix
-from implicit.als import AlternatingLeastSquares
-from sklearn.model_selection import train_test_split
-
-# Funciones para cargar datos
-@st.cache_data
-def cargar_datos():
-    url = 'https://drive.google.com/uc?id=1NmAZBoSj8YqWFbypAm8HYMj2YHbRyggT'
-    output = 'datos.csv'
-    gdown.download(url, output, quiet=False)
-    return pd.read_csv(output)
-
-@st.cache_data
-def cargar_ventas_mensuales():
-    url = 'https://drive.google.com/uc?id=1-21lc0LEqQLeph9YmnqIv5dhnDMzV15q'
-    output = 'ventas_mensuales.csv'
-    gdown.download(url, output, quiet=False)
-    return pd.read_csv(output)
+from registro_modelos import huella_archivo
+from fuentes_datos import obtener_archivo, ruta_local
+from datos import cargar_transacciones, cargar_ventas
+from catalogo import construir_catalogo, construir_indice_descripciones, construir_indice_selectores
+from combos import pares_recomendados, calcular_combos, formatear_combos
+from ventas import agregar_ventas_por_producto, resumir_combos, formatear_resumen
+from recomendador import secciones, filtrar_por_categoria, obtener_modelo_seccion, precargar_modelos, recomendar_lote
+
+# Funciones para cargar datos.
+# Los datos y sus índices se cargan una vez por proceso y versión de los archivos (huella) y todas las sesiones
+# comparten los mismos objetos de solo lectura; la copia Feather se mapea en memoria, así que varios procesos
+# comparten también las páginas. Cada sesión solo guarda sus selecciones
+@st.cache_resource(max_entries=1)
+def cargar_datos(huella):
+    return cargar_transacciones(ruta_local('datos.csv'), mapear=True)
+
+@st.cache_resource(max_entries=1)
+def cargar_ventas_mensuales(huella):
+    return cargar_ventas(ruta_local('ventas_mensuales.csv'), mapear=True)
 
 # Cargar datos
-df = cargar_datos()
-df_ventas = cargar_ventas_mensuales()
-
-# Diccionario para mapear categorías con sus valores de sección
-secciones = {
-    'Limpieza del Hogar': 14,
-    'Cuidado Personal': 16,
-    'Bebidas': 24,
-    'Alimentos': 25
-}
-
-# Función para filtrar productos por categoría seleccionada
-def filtrar_por_categoria(df, categoria_seleccionada):
-    seccion = secciones.get(categoria_seleccionada)
-    return df[df['SECCION'] == seccion]
-
-# Obtener el top 200 productos más vendidos de la categoría seleccionada
-def obtener_top_200_productos(df_categoria):
-    if df_categoria.empty:
-        return pd.DataFrame()
-    else:
-        top_200_productos = df_categoria.groupby('COD_PRODUCTO')['CANTIDAD'].sum().nlargest(200).index
-        return df_categoria[df_categoria['COD_PRODUCTO'].isin(top_200_productos)]
-
-# Preparar datos para entrenar el modelo ALS
-def preparar_datos_para_entrenar(df):
-    if len(df) > 0:
-        df_train, df_test = train_test_split(df, test_size=0.3, random_state=42)
-        df_train_compras = df_train.groupby(['COD_FACTURA', 'COD_PRODUCTO'])['CANTIDAD'].sum().unstack().fillna(0)
-        return df_train_compras
-    else:
-        st.error("No hay suficientes datos para dividir en entrenamiento y prueba.")
-        return None
-
-# Entrenar el modelo ALS
-def entrenar_modelo_als(df_train_compras):
-    if df_train_compras is not None:
-        df_train_sparse = csr_matrix(df_train_compras.values)
-        als_model = AlternatingLeastSquares(factors=50, regularization=0.1, iterations=30)
-        als_model.fit(df_train_sparse)
-        return als_model, df_train_sparse
-    else:
-        return None, None
+huella_datos = huella_archivo(obtener_archivo('datos.csv'))
+huella_ventas = huella_archivo(obtener_archivo('ventas_mensuales.csv'))
+df = cargar_datos(huella_datos)
+df_ventas = cargar_ventas_mensuales(huella_ventas)
+
+# Índices de productos para resolver códigos, descripciones, precios y costos sin recorrer df,
+# y el índice sección → subcategoría → productos que llena los selectores de la página 1
+@st.cache_resource(max_entries=1)
+def cargar_indices_productos(huella):
+    df = cargar_datos(huella)
+    return construir_catalogo(df), construir_indice_descripciones(df), construir_indice_selectores(df)
+
+catalogo, codigos_por_descripcion, indice_selectores = cargar_indices_productos(huella_datos)
+
+# Agregados de ventas mensuales por producto para el resumen de combos
+@st.cache_resource(max_entries=1)
+def cargar_agregados_ventas(huella):
+    return agregar_ventas_por_producto(cargar_ventas_mensuales(huella))
+
+agregados_ventas = cargar_agregados_ventas(huella_ventas)
+
+# Mapear en memoria los modelos entrenados fuera de línea (una vez por proceso y versión de los datos)
+@st.cache_resource
+def cargar_modelos_entrenados(huella):
+    return precargar_modelos(huella)
+
+cargar_modelos_entrenados(huella_datos)
 
 # Generar recomendaciones para los productos seleccionados
-def generar_recomendaciones_seleccionados(df_train_compras, als_model, df_train_sparse, productos_seleccionados_ids):
-    als_recommendations = {}
-    for product_id in productos_seleccionados_ids:
-        try:
-            product_idx = df_train_compras.columns.get_loc(product_id)
-            recommended_products = als_model.recommend(product_idx, df_train_sparse.T, N=6, filter_already_liked_items=False)
-            recommended_products_list = [df_train_compras.columns[i] for i, _ in zip(recommended_products[0], recommended_products[1]) if df_train_compras.columns[i] != product_id]
-            als_recommendations[product_id] = recommended_products_list[:5]
-        except KeyError:
-            st.warning(f"El producto con ID {product_id} no se encontró en el modelo.")
+def generar_recomendaciones_seleccionados(productos, als_model, productos_seleccionados_ids):
+    als_recommendations, faltantes = recomendar_lote(productos, als_model, productos_seleccionados_ids, N=5)
+    for product_id in faltantes:
+        st.warning(f"El producto con ID {product_id} no se encontró en el modelo.")
     return als_recommendations
 
 # Configuración de la aplicación Streamlit
@@ -86,11 +62,12 @@ menu_seleccion = st.sidebar.radio("Seleccione una ventana:", ["Seleccionar Produ
 if menu_seleccion == "Seleccionar Productos":
     st.header("Selecciona los Productos para Recomendación")
     categoria_seleccionada = st.selectbox("Seleccione una Categoría", list(secciones.keys()))
-    df_categoria = filtrar_por_categoria(df, categoria_seleccionada)
-    st.session_state['df_categoria'] = df_categoria
-    subcategorias_disponibles = df_categoria['DESC_CLASE'].unique()
+    subcategorias = indice_selectores.get(secciones.get(categoria_seleccionada), {})
+    st.session_state['categoria'] = categoria_seleccionada
+    st.session_state['seccion'] = secciones.get(categoria_seleccionada)
+    subcategorias_disponibles = list(subcategorias)
     subcategoria_seleccionada = st.selectbox("Seleccione una Subcategoría", subcategorias_disponibles)
-    productos_disponibles = df_categoria[df_categoria['DESC_CLASE'] == subcategoria_seleccionada]['DESC_PRODUCTO'].unique()
+    productos_disponibles = subcategorias.get(subcategoria_seleccionada, [])
     productos_seleccionados = st.multiselect("Seleccione hasta 4 productos:", productos_disponibles, max_selections=4)
     st.session_state.productos_seleccionados = productos_seleccionados
 
@@ -98,79 +75,35 @@ if menu_seleccion == "Seleccionar Productos":
 elif menu_seleccion == "Recomendaciones":
     st.header("Combos Recomendados")
     if 'productos_seleccionados' in st.session_state and st.session_state.productos_seleccionados:
-        df_categoria = st.session_state['df_categoria']
-        productos_seleccionados_ids = [df[df['DESC_PRODUCTO'] == nombre]['COD_PRODUCTO'].values[0] for nombre in st.session_state.productos_seleccionados]
-        df_top_200 = obtener_top_200_productos(df_categoria)
-        df_train_compras = preparar_datos_para_entrenar(df_top_200)
-        modelo_als, df_train_sparse = entrenar_modelo_als(df_train_compras)
-        recomendaciones = generar_recomendaciones_seleccionados(df_train_compras, modelo_als, df_train_sparse, productos_seleccionados_ids)
-        combos = []
-        for producto_id in productos_seleccionados_ids:
-            descripcion_a = df[df['COD_PRODUCTO'] == producto_id]['DESC_PRODUCTO'].values[0]
-            for recomendacion_id in recomendaciones.get(producto_id, []):
-                descripcion_b = df[df['COD_PRODUCTO'] == recomendacion_id]['DESC_PRODUCTO'].values[0]
-                precio_a = df[df['COD_PRODUCTO'] == producto_id]['VALOR_PVSI'].values[0]
-                precio_b = df[df['COD_PRODUCTO'] == recomendacion_id]['VALOR_PVSI'].values[0]
-                costo_a = df[df['COD_PRODUCTO'] == producto_id]['COSTO'].values[0]
-                costo_b = df[df['COD_PRODUCTO'] == recomendacion_id]['COSTO'].values[0]
-                precio_combo = precio_a + precio_b
-                margen_combo = round(((precio_combo - (costo_a + costo_b)) / precio_combo) * 100, 2)
-                combos.append({
-                    'Producto A': descripcion_a,
-                    'Producto B': descripcion_b,
-                    'Precio Combo': f"${precio_combo:.2f}",
-                    'Margen Combo': f"{margen_combo}%"
-                })
-        df_combos = pd.DataFrame(combos)
+        productos_seleccionados_ids = [codigos_por_descripcion.at[nombre] for nombre in st.session_state.productos_seleccionados]
+        df_categoria = filtrar_por_categoria(df, st.session_state['categoria'])
+        modelo = obtener_modelo_seccion(st.session_state['seccion'], df_categoria, huella_datos)
+        recomendaciones = {}
+        if modelo is not None:
+            productos, modelo_als, _ = modelo
+            recomendaciones = generar_recomendaciones_seleccionados(productos, modelo_als, productos_seleccionados_ids)
+        else:
+            st.error("No hay suficientes datos para entrenar el modelo de esta sección.")
+        codigos_a, codigos_b = pares_recomendados(productos_seleccionados_ids, recomendaciones)
+        combos = calcular_combos(catalogo, codigos_a, codigos_b)
+        df_combos = formatear_combos(combos, 'Margen Combo')
         st.table(df_combos)
         seleccion_indices = st.multiselect("Seleccione los índices de los combos que desea considerar:", df_combos.index.tolist())
-        st.session_state.combos_seleccionados = df_combos.loc[seleccion_indices]
+        st.session_state.combos_seleccionados = combos.loc[seleccion_indices]
 
 # Ventana 3: Resumen de Combos Seleccionados
 elif menu_seleccion == "Resumen de Combos Seleccionados":
     st.header("Resumen de Combos Seleccionados")
     
     if 'combos_seleccionados' in st.session_state and not st.session_state.combos_seleccionados.empty:
-        resumen = []
-        for _, row in st.session_state.combos_seleccionados.iterrows():
-            producto_a = row['Producto A']
-            producto_b = row['Producto B']
-            
-            # Obtener los códigos de producto correspondientes
-            try:
-                producto_a_id = df[df['DESC_PRODUCTO'] == producto_a]['COD_PRODUCTO'].values[0]
-                producto_b_id = df[df['DESC_PRODUCTO'] == producto_b]['COD_PRODUCTO'].values[0]
-            except IndexError:
-                st.error(f"No se encontró el código para '{producto_a}' o '{producto_b}'.")
-                continue  # Saltar este combo si falta alguno de los códigos
-
-            # Filtrar las ventas mensuales de cada producto usando los nombres de columna correctos
-            ventas_a = df_ventas[df_ventas['COD_PRODUCTO'] == producto_a_id]
-            ventas_b = df_ventas[df_ventas['COD_PRODUCTO'] == producto_b_id]
-
-            # Verificar si hay datos disponibles para ambos productos
-            if not ventas_a.empty and not ventas_b.empty:
-                # Calcular las métricas requeridas utilizando los nombres de columna correctos y formatear con separadores de miles
-                cantidad_estimada = "{:,.0f}".format(ventas_a['Cantidad Vendida'].mean() + ventas_b['Cantidad Vendida'].mean())
-                venta_estimada = "{:,.0f}".format(ventas_a['Precio Total'].mean() + ventas_b['Precio Total'].mean())
-                ganancia_estimada = "{:,.0f}".format(
-                    (ventas_a['Precio Total'].mean() - ventas_a['Costo total'].mean()) +
-                    (ventas_b['Precio Total'].mean() - ventas_b['Costo total'].mean())
-                )
-
-                # Agregar los datos del combo al resumen
-                resumen.append({
-                    'Combo': f"{producto_a} + {producto_b}",
-                    'Cantidad estimada de venta': cantidad_estimada,
-                    'Venta estimada ($)': venta_estimada,
-                    'Ganancia estimada ($)': ganancia_estimada
-                })
-            else:
-                st.warning(f"No hay datos de ventas mensuales para '{producto_a}' o '{producto_b}'.")
-
-        # Mostrar el resumen si se generaron datos
-        if resumen:
-            df_resumen = pd.DataFrame(resumen)
+        combos_seleccionados = st.session_state.combos_seleccionados
+        resumen = resumir_combos(combos_seleccionados, agregados_ventas)
+        for _, row in combos_seleccionados[~resumen['con_datos']].iterrows():
+            st.warning(f"No hay datos de ventas mensuales para '{row['Producto A']}' o '{row['Producto B']}'.")
+        resumen = resumen[resumen['con_datos']]
+
+        if not resumen.empty:
+            df_resumen = formatear_resumen(resumen)
             st.table(df_resumen)
         else:
             st.write("No se han generado datos de resumen para los combos seleccionados.")
@@ -1,90 +1,88 @@
 import streamlit as st
-import gdown
 import pandas as pd
-from scipy.sparse import csr_matrix
-from implicit.als import AlternatingLeastSquares
-from sklearn.model_selection import train_test_split
-import matplotlib.pyplot as plt
+from registro_modelos import huella_archivo
+from fuentes_datos import obtener_archivo, ruta_local
+from datos import cargar_transacciones, cargar_ventas
+from catalogo import construir_catalogo, construir_indice_descripciones, construir_indice_selectores
+from combos import pares_recomendados, calcular_combos, formatear_combos
+from ventas import agregar_ventas_por_producto, resumir_combos, formatear_resumen
+from recomendador import secciones, filtrar_por_categoria, solicitar_modelo_seccion, precargar_modelos, recomendar_lote
+from instrumentacion import ACTIVA as INSTRUMENTACION_ACTIVA, solicitud, ultimas_solicitudes, resumen_etapas, exportar_prometheus
 import time
 
-# Funciones para cargar datos
-
-def cargar_datos():
-    url = 'https://drive.google.com/uc?id=1NmAZBoSj8YqWFbypAm8HYMj2YHbRyggT'
-    output = 'datos.csv'
-    gdown.download(url, output, quiet=False)
-    return pd.read_csv(output)
-
-def cargar_ventas_mensuales():
-    url = 'https://drive.google.com/uc?id=1-21lc0LEqQLeph9YmnqIv5dhnDMzV15q'
-    output = 'ventas_mensuales.csv'
-    gdown.download(url, output, quiet=False)
-    return pd.read_csv(output)
-
-# Verificar si los datos ya están cargados en st.session_state
-if "datos" not in st.session_state:
-    st.session_state.datos = cargar_datos()
-
-if "ventas_mensuales" not in st.session_state:
-    st.session_state.ventas_mensuales = cargar_ventas_mensuales()
-
-# Asignar los datos a variables
-df = st.session_state.datos
-df_ventas = st.session_state.ventas_mensuales
-
-secciones = {
-    'Limpieza del Hogar': 14,
-    'Cuidado Personal': 16,
-    'Bebidas': 24,
-    'Alimentos': 25
-}
-
-# Función para filtrar productos por categoría seleccionada
-def filtrar_por_categoria(df, categoria_seleccionada):
-    seccion = secciones.get(categoria_seleccionada)
-    return df[df['SECCION'] == seccion]
-
-# Obtener el top 200 productos más vendidos de la categoría seleccionada
-def obtener_top_200_productos(df_categoria):
-    if df_categoria.empty:
-        return pd.DataFrame()
-    else:
-        top_200_productos = df_categoria.groupby('COD_PRODUCTO')['CANTIDAD'].sum().nlargest(200).index
-        return df_categoria[df_categoria['COD_PRODUCTO'].isin(top_200_productos)]
-
-# Preparar datos para entrenar el modelo ALS
-def preparar_datos_para_entrenar(df):
-    if len(df) > 0:
-        df_train, df_test = train_test_split(df, test_size=0.3, random_state=42)
-        df_train_compras = df_train.groupby(['COD_FACTURA', 'COD_PRODUCTO'])['CANTIDAD'].sum().unstack().fillna(0)
-        return df_train_compras
-    else:
-        st.error("No hay suficientes datos para dividir en entrenamiento y prueba.")
-        return None
-
-# Entrenar el modelo ALS
-def entrenar_modelo_als(df_train_compras):
-    if df_train_compras is not None:
-        df_train_sparse = csr_matrix(df_train_compras.values)
-        als_model = AlternatingLeastSquares(factors=50, regularization=0.1, iterations=30)
-        als_model.fit(df_train_sparse)
-        return als_model, df_train_sparse
-    else:
-        return None, None
+# Funciones para cargar datos.
+# Los datos y sus índices se cargan una vez por proceso y versión de los archivos (huella) y todas las sesiones
+# comparten los mismos objetos de solo lectura; la copia Feather se mapea en memoria, así que varios procesos
+# comparten también las páginas. Cada sesión solo guarda sus selecciones.
+# Nada se carga al importar el script: la pantalla de inicio de sesión no lee datos ni importa el modelo,
+# y cada página pide solo lo que usa
+@st.cache_resource(max_entries=1)
+def cargar_datos(huella):
+    return cargar_transacciones(ruta_local('datos.csv'), mapear=True)
+
+@st.cache_resource(max_entries=1)
+def cargar_ventas_mensuales(huella):
+    return cargar_ventas(ruta_local('ventas_mensuales.csv'), mapear=True)
+
+# Índices de productos para resolver códigos, descripciones, precios y costos sin recorrer df,
+# y el índice sección → subcategoría → productos que llena los selectores de la página 1
+@st.cache_resource(max_entries=1)
+def cargar_indices_productos(huella):
+    df = cargar_datos(huella)
+    return construir_catalogo(df), construir_indice_descripciones(df), construir_indice_selectores(df)
+
+# Agregados de ventas mensuales por producto para el resumen de combos
+@st.cache_resource(max_entries=1)
+def cargar_agregados_ventas(huella):
+    return agregar_ventas_por_producto(cargar_ventas_mensuales(huella))
+
+# Mapear en memoria los modelos entrenados fuera de línea (una vez por proceso y versión de los datos)
+@st.cache_resource
+def cargar_modelos_entrenados(huella):
+    return precargar_modelos(huella)
 
 # Generar recomendaciones para los productos seleccionados
-def generar_recomendaciones_seleccionados(df_train_compras, als_model, df_train_sparse, productos_seleccionados_ids):
-    als_recommendations = {}
-    for product_id in productos_seleccionados_ids:
-        try:
-            product_idx = df_train_compras.columns.get_loc(product_id)
-            recommended_products = als_model.recommend(product_idx, df_train_sparse.T, N=6, filter_already_liked_items=False)
-            recommended_products_list = [df_train_compras.columns[i] for i, _ in zip(recommended_products[0], recommended_products[1]) if df_train_compras.columns[i] != product_id]
-            als_recommendations[product_id] = recommended_products_list[:5]
-        except KeyError:
-            st.warning(f"El producto con ID {product_id} no se encontró en el modelo.")
+def generar_recomendaciones_seleccionados(productos, als_model, productos_seleccionados_ids):
+    als_recommendations, faltantes = recomendar_lote(productos, als_model, productos_seleccionados_ids, N=5)
+    for product_id in faltantes:
+        st.warning(f"El producto con ID {product_id} no se encontró en el modelo.")
     return als_recommendations
 
+# Mostrar el avance del entrenamiento en segundo plano; al terminar se vuelve a ejecutar la página completa
+@st.fragment(run_every=1)
+def mostrar_progreso_entrenamiento(trabajo):
+    if trabajo.terminado():
+        st.rerun()
+    texto = "Aplicando un modelo de inteligencia artificial para generación de combos..."
+    if trabajo.iteracion:
+        texto += f" iteración {trabajo.iteracion} de {trabajo.total_iteraciones} ({trabajo.segundos():.0f} s)"
+    st.progress(trabajo.progreso(), text=texto)
+
+# Panel de depuración (solo para el administrador): desglose por etapa de las últimas solicitudes
+def mostrar_panel_depuracion(n=10):
+    with st.expander("Depuración: tiempos por etapa"):
+        filas = []
+        for registro_solicitud in ultimas_solicitudes(n):
+            fila = {
+                'Solicitud': registro_solicitud['nombre'],
+                'Hora': time.strftime('%H:%M:%S', time.localtime(registro_solicitud['inicio'])),
+                'Total (ms)': registro_solicitud['segundos'] * 1000,
+                'Memoria (MB)': registro_solicitud['memoria_mb']
+            }
+            for etapa in registro_solicitud['etapas']:
+                fila[etapa['etapa']] = fila.get(etapa['etapa'], 0) + etapa['segundos'] * 1000
+            filas.append(fila)
+        if filas:
+            st.subheader(f"Últimas {len(filas)} solicitudes (ms)")
+            st.dataframe(pd.DataFrame(filas).round(2), use_container_width=True)
+        else:
+            st.write("Aún no hay solicitudes medidas.")
+        acumulados = pd.DataFrame.from_dict(resumen_etapas(), orient='index')
+        if not acumulados.empty:
+            st.subheader("Acumulado del proceso")
+            st.dataframe(acumulados.sort_values('segundos', ascending=False), use_container_width=True)
+        st.download_button("Exportar métricas (Prometheus)", exportar_prometheus(), file_name="metricas.prom", mime="text/plain")
+
 users = {
     "admin": "1234",
     "user1": "password",
@@ -129,6 +127,7 @@ def show_login():
             if login_button:
                 if login(username, password):
                     st.session_state.authenticated = True
+                    st.session_state.usuario = username
                     with st.spinner("Logeando..."):
                         time.sleep(3)
                     st.session_state.page = "app"
@@ -141,6 +140,7 @@ def home():
     st.session_state.pagina_actual = 1
     st.session_state.modelo_ejecutado = False
     st.session_state.seleccion_indices = []
+    st.session_state.pop('trabajo_modelo', None)
 
 def avanzar_pagina():
     if st.session_state.pagina_actual < 3:
@@ -153,10 +153,13 @@ def retroceder_pagina():
         if st.session_state.pagina_actual == 1:
             st.session_state.modelo_ejecutado = False
             st.session_state.seleccion_indices = []
+            # El entrenamiento sigue en segundo plano y su modelo queda en el registro
+            st.session_state.pop('trabajo_modelo', None)
 
 def show_app():
     if "pagina_actual" not in st.session_state:
         st.session_state.pagina_actual = 1
+    huella_datos = huella_archivo(obtener_archivo('datos.csv'))
 
     # Ventana 1: Selección de Productos
     if st.session_state.pagina_actual == 1:
@@ -164,13 +167,15 @@ def show_app():
         with col2:
             st.title("Selecciona los Productos para Recomendación")
             st.subheader("Seleccione una Categoría")
+            _, _, indice_selectores = cargar_indices_productos(huella_datos)
             categoria_seleccionada = st.selectbox("", list(secciones.keys()), label_visibility="collapsed")
-            df_categoria = filtrar_por_categoria(df, categoria_seleccionada)
-            st.session_state['df_categoria'] = df_categoria
-            subcategorias_disponibles = df_categoria['DESC_CLASE'].unique()
+            subcategorias = indice_selectores.get(secciones.get(categoria_seleccionada), {})
+            st.session_state['categoria'] = categoria_seleccionada
+            st.session_state['seccion'] = secciones.get(categoria_seleccionada)
+            subcategorias_disponibles = list(subcategorias)
             st.subheader("Seleccione una Subcategoría")
             subcategoria_seleccionada = st.selectbox("", subcategorias_disponibles, label_visibility="collapsed")
-            productos_disponibles = df_categoria[df_categoria['DESC_CLASE'] == subcategoria_seleccionada]['DESC_PRODUCTO'].unique()
+            productos_disponibles = subcategorias.get(subcategoria_seleccionada, [])
             st.subheader("Seleccione hasta 4 productos:")
             productos_seleccionados = st.multiselect("", productos_disponibles, max_selections=4, label_visibility="collapsed")
             st.session_state.productos_seleccionados = productos_seleccionados
@@ -187,41 +192,41 @@ def show_app():
             if "df_combos" not in st.session_state:
                 st.session_state['df_combos'] = None
             if not st.session_state.modelo_ejecutado:
-                df_categoria = st.session_state['df_categoria']
-                productos_seleccionados_ids = [df[df['DESC_PRODUCTO'] == nombre]['COD_PRODUCTO'].values[0] for nombre in st.session_state.productos_seleccionados]
-                df_top_200 = obtener_top_200_productos(df_categoria)
-                df_train_compras = preparar_datos_para_entrenar(df_top_200)
-                with st.spinner("Aplicando un modelo de inteligencia artificial para generación de combos..."):
-                    modelo_als, df_train_sparse = entrenar_modelo_als(df_train_compras)
-                recomendaciones = generar_recomendaciones_seleccionados(df_train_compras, modelo_als, df_train_sparse, productos_seleccionados_ids)
-                combos = []
-                for producto_id in productos_seleccionados_ids:
-                    descripcion_a = df[df['COD_PRODUCTO'] == producto_id]['DESC_PRODUCTO'].values[0]
-                    for recomendacion_id in recomendaciones.get(producto_id, []):
-                        descripcion_b = df[df['COD_PRODUCTO'] == recomendacion_id]['DESC_PRODUCTO'].values[0]
-                        precio_a = df[df['COD_PRODUCTO'] == producto_id]['VALOR_PVSI'].values[0]
-                        precio_b = df[df['COD_PRODUCTO'] == recomendacion_id]['VALOR_PVSI'].values[0]
-                        costo_a = df[df['COD_PRODUCTO'] == producto_id]['COSTO'].values[0]
-                        costo_b = df[df['COD_PRODUCTO'] == recomendacion_id]['COSTO'].values[0]
-                        precio_combo = precio_a + precio_b
-                        margen_combo = round(((precio_combo - (costo_a + costo_b)) / precio_combo) * 100, 2)
-                        combos.append({
-                            'Producto A': descripcion_a,
-                            'Producto B': descripcion_b,
-                            'Precio Combo': f"${precio_combo:.2f}",
-                            'Margen': f"{margen_combo}%"
-                        })
-                st.session_state['df_combos'] = pd.DataFrame(combos)
+                catalogo, codigos_por_descripcion, _ = cargar_indices_productos(huella_datos)
+                productos_seleccionados_ids = [codigos_por_descripcion.at[nombre] for nombre in st.session_state.productos_seleccionados]
+                # El modelo se obtiene en segundo plano; otras sesiones que pidan la misma sección comparten el trabajo
+                if st.session_state.get('trabajo_modelo') is None:
+                    cargar_modelos_entrenados(huella_datos)
+                    df_categoria = filtrar_por_categoria(cargar_datos(huella_datos), st.session_state['categoria'])
+                    st.session_state.trabajo_modelo = solicitar_modelo_seccion(st.session_state['seccion'], df_categoria, huella_datos)
+                trabajo = st.session_state.trabajo_modelo
+                if not trabajo.terminado():
+                    mostrar_progreso_entrenamiento(trabajo)
+                    st.button("Anterior", on_click=retroceder_pagina, type="primary")
+                    return
+                del st.session_state['trabajo_modelo']
+                modelo = trabajo.resultado
+                recomendaciones = {}
+                if modelo is not None:
+                    productos, modelo_als, _ = modelo
+                    recomendaciones = generar_recomendaciones_seleccionados(productos, modelo_als, productos_seleccionados_ids)
+                elif trabajo.error is not None:
+                    st.error(f"No se pudo entrenar el modelo: {trabajo.error}")
+                else:
+                    st.error("No hay suficientes datos para entrenar el modelo de esta sección.")
+                codigos_a, codigos_b = pares_recomendados(productos_seleccionados_ids, recomendaciones)
+                df_combos = calcular_combos(catalogo, codigos_a, codigos_b)
+                df_combos.index = range(1, len(df_combos) + 1)
+                st.session_state['df_combos'] = df_combos
                 st.session_state.modelo_ejecutado = True
-            df_combos = st.session_state['df_combos']
+            combos = st.session_state['df_combos']
+            df_combos = formatear_combos(combos)
 
             def generar_barra_visual(valor, longitud=20):
                 num_I = int((valor / 100) * longitud)
                 return '[' + 'I' * num_I + '-' * (longitud - num_I) + ']'
 
-            df_combos['Barra'] = df_combos['Margen'].str.rstrip('%').astype(float).apply(generar_barra_visual)
-
-            df_combos.index = range(1, len(df_combos) + 1)
+            df_combos['Barra'] = combos['margen_combo'].apply(generar_barra_visual)
 
             if "seleccion_indices" not in st.session_state:
                 st.session_state.seleccion_indices = []
@@ -239,7 +244,7 @@ def show_app():
                 with col2_1:
                     if st.button("Guardar Selección", use_container_width=True, type="secondary"):
                         st.session_state.seleccion_indices = seleccion_indices
-                        st.session_state.combos_seleccionados = df_combos.loc[seleccion_indices]
+                        st.session_state.combos_seleccionados = combos.loc[seleccion_indices]
                         with col2_2:
                             st.success("¡Selección guardada!")
             with col4:
@@ -305,42 +310,17 @@ def show_app():
         st.header("Resumen de Combos Seleccionados")
 
         if 'combos_seleccionados' in st.session_state and not st.session_state.combos_seleccionados.empty:
-            resumen = []
-            for _, row in st.session_state.combos_seleccionados.iterrows():
-                producto_a = row['Producto A']
-                producto_b = row['Producto B']
-
-                # Obtener los códigos de producto correspondientes
-                try:
-                    producto_a_id = df[df['DESC_PRODUCTO'] == producto_a]['COD_PRODUCTO'].values[0]
-                    producto_b_id = df[df['DESC_PRODUCTO'] == producto_b]['COD_PRODUCTO'].values[0]
-                except IndexError:
-                    st.error(f"No se encontró el código para '{producto_a}' o '{producto_b}'.")
-                    continue  # Saltar este combo si falta alguno de los códigos
-
-                # Filtrar las ventas mensuales de cada producto usando los nombres de columna correctos
-                ventas_a = df_ventas[df_ventas['COD_PRODUCTO'] == producto_a_id]
-                ventas_b = df_ventas[df_ventas['COD_PRODUCTO'] == producto_b_id]
-
-                if not ventas_a.empty and not ventas_b.empty:
-                    cantidad_estimada = "{:,.0f}".format(ventas_a['Cantidad Vendida'].mean() + ventas_b['Cantidad Vendida'].mean())
-                    venta_estimada = "{:,.0f}".format(ventas_a['Precio Total'].mean() + ventas_b['Precio Total'].mean())
-                    ganancia_estimada = "{:,.0f}".format(
-                        (ventas_a['Precio Total'].mean() - ventas_a['Costo total'].mean()) +
-                        (ventas_b['Precio Total'].mean() - ventas_b['Costo total'].mean())
-                    )
-
-                    resumen.append({
-                        'Combo': f"{producto_a} + {producto_b}",
-                        'Cantidad estimada de venta': cantidad_estimada,
-                        'Venta estimada ($)': venta_estimada,
-                        'Ganancia estimada ($)': ganancia_estimada
-                    })
-                else:
-                    st.warning(f"No hay datos de ventas mensuales para '{producto_a}' o '{producto_b}'.")
+            combos_seleccionados = st.session_state.combos_seleccionados
+            agregados_ventas = cargar_agregados_ventas(huella_archivo(obtener_archivo('ventas_mensuales.csv')))
+            resumen = resumir_combos(combos_seleccionados, agregados_ventas)
+            for _, row in combos_seleccionados[~resumen['con_datos']].iterrows():
+                st.warning(f"No hay datos de ventas mensuales para '{row['Producto A']}' o '{row['Producto B']}'.")
+            resumen = resumen[resumen['con_datos']]
+
+            if not resumen.empty:
+                import matplotlib.pyplot as plt
 
-            if resumen:
-                df_resumen = pd.DataFrame(resumen)
+                df_resumen = formatear_resumen(resumen)
                 lista_combos = ["Combo "+ str(i+1) for i in range(len(df_resumen))]
 
                 styled_df = (
@@ -423,7 +403,11 @@ def show_app():
         with col3:
             st.button("Home", on_click=home, use_container_width=True, type="primary")
 
-if st.session_state.page == "login":
-    show_login()
-elif st.session_state.page == "app":
-    show_app()
\ No newline at end of file
+with solicitud(f"pagina_{st.session_state.get('pagina_actual', 1)}" if st.session_state.page == "app" else "login"):
+    if st.session_state.page == "login":
+        show_login()
+    elif st.session_state.page == "app":
+        show_app()
+
+if INSTRUMENTACION_ACTIVA and st.session_state.page == "app" and st.session_state.get('usuario') == "admin":
+    mostrar_panel_depuracion()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+# Artefactos de modelos entrenados fuera de línea.
+# Cada sección guarda versiones en artefactos/seccion_<n>/<version>/ con los factores en .npy
+# y un manifiesto JSON; actual.json apunta a la versión vigente de la sección.
+# scipy e implicit se importan al guardar o cargar un modelo, no al importar el módulo.
+
+DIRECTORIO_ARTEFACTOS = os.environ.get('ARTEFACTOS_DIR', 'artefactos')
+# Versiones que se conservan por sección, contando la vigente (0 = conservar todas)
+VERSIONES_CONSERVADAS = int(os.environ.get('ARTEFACTOS_VERSIONES', 5))
+VERSION_FORMATO = 1
+
+ARCHIVOS = {
+    'factores_productos': 'factores_productos.npy',
+    'factores_facturas': 'factores_facturas.npy',
+    'productos': 'productos.npy',
+    'facturas': 'facturas.npy',
+    'matriz_data': 'matriz_data.npy',
+    'matriz_indices': 'matriz_indices.npy',
+    'matriz_indptr': 'matriz_indptr.npy'
+}
+
+
+def directorio_seccion(seccion, directorio=DIRECTORIO_ARTEFACTOS):
+    return os.path.join(directorio, f'seccion_{seccion}')
+
+
+# Escribir un JSON de forma atómica para que los lectores nunca vean un archivo a medias
+def _escribir_json(ruta, contenido):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(contenido, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+# Guardar el modelo de una sección como una nueva versión y marcarla como vigente.
+# facturas (COD_FACTURA de cada fila de la matriz) permite actualizarla después con facturas nuevas;
+# origen se copia al manifiesto para dejar constancia de cómo se obtuvo la versión;
+# top_productos es el corte de productos más vendidos con que se entrenó (0 = toda la sección)
+def guardar_artefactos(seccion, productos, als_model, matriz, huella, hiperparametros, directorio=DIRECTORIO_ARTEFACTOS,
+                       facturas=None, origen=None, top_productos=None):
+    from scipy.sparse import csr_matrix
+
+    if hasattr(als_model, 'to_cpu'):
+        als_model = als_model.to_cpu()
+    # El sufijo al azar distingue dos versiones guardadas en el mismo segundo
+    version = time.strftime('%Y%m%d-%H%M%S') + '-' + huella[:8] + '-' + uuid.uuid4().hex[:6]
+    raiz = directorio_seccion(seccion, directorio)
+    destino = os.path.join(raiz, version)
+    temporal = destino + '.tmp'
+    os.makedirs(temporal, exist_ok=True)
+
+    matriz = csr_matrix(matriz)
+    arreglos = {
+        'factores_productos': np.ascontiguousarray(als_model.item_factors),
+        'factores_facturas': np.ascontiguousarray(als_model.user_factors),
+        'productos': np.asarray(productos),
+        'matriz_data': matriz.data,
+        'matriz_indices': matriz.indices,
+        'matriz_indptr': matriz.indptr
+    }
+    if facturas is not None:
+        arreglos['facturas'] = np.asarray(facturas)
+    for nombre, arreglo in arreglos.items():
+        np.save(os.path.join(temporal, ARCHIVOS[nombre]), arreglo)
+
+    manifiesto = {
+        'formato': VERSION_FORMATO,
+        'version': version,
+        'seccion': int(seccion),
+        'huella_datos': huella,
+        'hiperparametros': dict(hiperparametros),
+        'n_productos': int(matriz.shape[1]),
+        'n_facturas': int(matriz.shape[0]),
+        'creado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'archivos': {nombre: ARCHIVOS[nombre] for nombre in arreglos}
+    }
+    if origen is not None:
+        manifiesto['origen'] = origen
+    if top_productos is not None:
+        manifiesto['top_productos'] = int(top_productos)
+    _escribir_json(os.path.join(temporal, 'manifest.json'), manifiesto)
+    os.replace(temporal, destino)
+    _escribir_json(os.path.join(raiz, 'actual.json'), {'version': version})
+    podar_versiones(seccion, directorio)
+    return destino
+
+
+# Borrar las versiones más antiguas de una sección y dejar solo las últimas `conservar`.
+# Se ordenan por la fecha con que empieza el nombre y, dentro del mismo segundo, por fecha de modificación;
+# la versión vigente y los directorios .tmp de guardados en curso nunca se borran
+def podar_versiones(seccion, directorio=DIRECTORIO_ARTEFACTOS, conservar=VERSIONES_CONSERVADAS):
+    if conservar <= 0:
+        return []
+    raiz = directorio_seccion(seccion, directorio)
+    vigente = (cargar_manifiesto(seccion, directorio) or {}).get('version')
+    versiones = sorted(
+        (nombre for nombre in os.listdir(raiz)
+         if not nombre.endswith('.tmp') and os.path.isdir(os.path.join(raiz, nombre))),
+        key=lambda nombre: (nombre[:15], os.stat(os.path.join(raiz, nombre)).st_mtime_ns)
+    )
+    borradas = [version for version in versiones[:-conservar] if version != vigente]
+    for version in borradas:
+        shutil.rmtree(os.path.join(raiz, version), ignore_errors=True)
+    return borradas
+
+
+# Leer el manifiesto de la versión vigente de una sección (None si no hay artefactos)
+def cargar_manifiesto(seccion, directorio=DIRECTORIO_ARTEFACTOS):
+    raiz = directorio_seccion(seccion, directorio)
+    try:
+        with open(os.path.join(raiz, 'actual.json'), encoding='utf-8') as archivo:
+            version = json.load(archivo)['version']
+        with open(os.path.join(raiz, version, 'manifest.json'), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _cargar_arreglos(seccion, manifiesto, directorio):
+    ruta = os.path.join(directorio_seccion(seccion, directorio), manifiesto['version'])
+    return {
+        nombre: np.load(os.path.join(ruta, archivo), mmap_mode='r')
+        for nombre, archivo in manifiesto['archivos'].items()
+    }
+
+
+# Cargar la versión vigente de una sección mapeando los arreglos en memoria, sin entrenar nada.
+# Devuelve (productos, modelo_als, matriz) o None si no hay artefactos, o si fueron entrenados
+# con otros datos, otros hiperparámetros u otro corte de productos (top_productos; 0 = toda la sección)
+def cargar_artefactos(seccion, huella=None, hiperparametros=None, directorio=DIRECTORIO_ARTEFACTOS, top_productos=None):
+    from scipy.sparse import csr_matrix
+    from implicit.als import AlternatingLeastSquares
+
+    manifiesto = cargar_manifiesto(seccion, directorio)
+    if manifiesto is None or manifiesto.get('formato') != VERSION_FORMATO:
+        return None
+    if huella is not None and manifiesto['huella_datos'] != huella:
+        return None
+    if hiperparametros is not None and manifiesto['hiperparametros'] != dict(hiperparametros):
+        return None
+    if top_productos is not None and manifiesto.get('top_productos') != top_productos:
+        return None
+
+    arreglos = _cargar_arreglos(seccion, manifiesto, directorio)
+    als_model = AlternatingLeastSquares(**manifiesto['hiperparametros'], use_gpu=False)
+    als_model.item_factors = arreglos['factores_productos']
+    als_model.user_factors = arreglos['factores_facturas']
+    matriz = csr_matrix(
+        (arreglos['matriz_data'], arreglos['matriz_indices'], arreglos['matriz_indptr']),
+        shape=(manifiesto['n_facturas'], manifiesto['n_productos']),
+        copy=False
+    )
+    return pd.Index(arreglos['productos'], name='COD_PRODUCTO'), als_model, matriz
+
+
+# COD_FACTURA de cada fila de la matriz de la versión vigente (None si la versión no los guardó)
+def cargar_facturas(seccion, directorio=DIRECTORIO_ARTEFACTOS):
+    manifiesto = cargar_manifiesto(seccion, directorio)
+    if manifiesto is None or 'facturas' not in manifiesto['archivos']:
+        return None
+    facturas = _cargar_arreglos(seccion, manifiesto, directorio)['facturas']
+    return pd.Index(facturas, name='COD_FACTURA')
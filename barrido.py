@@ -0,0 +1,139 @@
+import argparse
+import itertools
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from recomendador import secciones, HIPERPARAMETROS_ALS
+from datos import cargar_transacciones
+from fuentes_datos import obtener_archivo
+from evaluacion import evaluar_seccion
+from entrenar_secciones import limitar_hilos_blas
+
+# Barrido de hiperparámetros del modelo ALS y del corte de productos por sección.
+# Cada configuración se entrena y evalúa con evaluacion.evaluar_seccion en un conjunto de procesos; se mide
+# el tiempo de ajuste, la memoria máxima asignada durante el ajuste y la inferencia (tracemalloc) y la latencia
+# por consulta. El reporte marca la frontera de Pareto: las configuraciones que ninguna otra supera a la vez
+# en costo y en calidad.
+#
+# Uso: python barrido.py --factors 16 32 50 --regularization 0.01 0.1 --iterations 10 30 --top 100 200 [--salida barrido.csv]
+
+COSTOS = ['entrenamiento_s', 'memoria_mb', 'inferencia_ms']
+
+_df = None
+
+
+# Cargar los datos y las dependencias del modelo una vez por proceso, antes de medir memoria con tracemalloc:
+# recomendador importa implicit y scipy recién al entrenar, y esa importación no debe contar en la primera configuración
+def _iniciar_proceso(ruta_datos):
+    global _df
+    import scipy.sparse
+    import implicit.als
+
+    _df = cargar_transacciones(ruta_datos)
+
+
+# Evaluar una configuración en una sección dentro de un proceso del barrido (top=0 usa toda la sección)
+def _evaluar_configuracion(seccion, configuracion, k, semilla, max_consultas, hilos):
+    hiperparametros = {clave: valor for clave, valor in configuracion.items() if clave != 'top'}
+    tracemalloc.start()
+    try:
+        with limitar_hilos_blas():
+            resultado = evaluar_seccion(_df[_df['SECCION'] == seccion], hiperparametros, configuracion['top'] or None, k,
+                                        semilla=semilla, max_consultas=max_consultas, num_threads=hilos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if resultado is None:
+        return None
+    return dict(configuracion, seccion=seccion, memoria_mb=pico / (1024 * 1024), **resultado)
+
+
+# Marcar las filas no dominadas: ninguna otra tiene todos los costos menores o iguales y la calidad mayor o igual,
+# con al menos una diferencia estricta
+def frontera_pareto(tabla, costos=COSTOS, calidad='ndcg'):
+    valores = tabla[costos].to_numpy()
+    calidades = tabla[calidad].to_numpy()
+    en_frontera = []
+    for i in range(len(tabla)):
+        no_peores = (valores <= valores[i]).all(axis=1) & (calidades >= calidades[i])
+        mejores = (valores < valores[i]).any(axis=1) | (calidades > calidades[i])
+        en_frontera.append(not (no_peores & mejores).any())
+    return pd.Series(en_frontera, index=tabla.index, name='pareto')
+
+
+# Resumir por configuración: calidad media de las secciones, tiempo total de ajuste, memoria máxima y latencia media
+def resumir_barrido(resultados, parametros, calidad='ndcg'):
+    tabla = pd.DataFrame(resultados)
+    resumen = tabla.groupby(parametros, as_index=False).agg(
+        precision=('precision', 'mean'),
+        recall=('recall', 'mean'),
+        map=('map', 'mean'),
+        ndcg=('ndcg', 'mean'),
+        entrenamiento_s=('entrenamiento_s', 'sum'),
+        memoria_mb=('memoria_mb', 'max'),
+        inferencia_ms=('inferencia_ms', 'mean'),
+        secciones=('seccion', 'count')
+    )
+    resumen['pareto'] = frontera_pareto(resumen, COSTOS, calidad)
+    return resumen.sort_values(['pareto', calidad], ascending=False, ignore_index=True)
+
+
+def barrer(ruta_datos, rejilla, secciones_barrido=None, k=5, semilla=42, max_consultas=None, procesos=None, calidad='ndcg'):
+    procesos = procesos or os.cpu_count() or 1
+    hilos = max(1, (os.cpu_count() or 1) // procesos)
+    secciones_barrido = secciones_barrido or list(secciones.values())
+    parametros = list(rejilla)
+    configuraciones = [dict(zip(parametros, valores)) for valores in itertools.product(*rejilla.values())]
+
+    resultados = []
+    inicio = time.time()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso, initargs=(ruta_datos,)) as ejecutor:
+        tareas = [
+            ejecutor.submit(_evaluar_configuracion, seccion, configuracion, k, semilla, max_consultas, hilos)
+            for configuracion in configuraciones
+            for seccion in secciones_barrido
+        ]
+        for completadas, tarea in enumerate(as_completed(tareas), 1):
+            resultado = tarea.result()
+            if resultado is not None:
+                resultados.append(resultado)
+            print(f"\r{completadas}/{len(tareas)} evaluaciones ({time.time() - inicio:.0f} s)", end='', flush=True)
+    print()
+    if not resultados:
+        return pd.DataFrame(), pd.DataFrame()
+    return pd.DataFrame(resultados), resumir_barrido(resultados, parametros, calidad)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Barrido de hiperparámetros ALS con reporte de Pareto costo/calidad.")
+    parser.add_argument('--datos', help="Archivo de transacciones (por defecto la copia local de datos.csv)")
+    parser.add_argument('--factors', type=int, nargs='+', default=[HIPERPARAMETROS_ALS['factors']])
+    parser.add_argument('--regularization', type=float, nargs='+', default=[HIPERPARAMETROS_ALS['regularization']])
+    parser.add_argument('--iterations', type=int, nargs='+', default=[HIPERPARAMETROS_ALS['iterations']])
+    parser.add_argument('--top', type=int, nargs='+', default=[200], help="Productos más vendidos por sección (0 = toda la sección)")
+    parser.add_argument('--secciones', type=int, nargs='+', help="Secciones a evaluar (por defecto todas)")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--calidad', choices=['precision', 'recall', 'map', 'ndcg'], default='ndcg')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--max-consultas', type=int, help="Consultas muestreadas por sección")
+    parser.add_argument('--procesos', type=int, help="Procesos en paralelo (por defecto uno por núcleo)")
+    parser.add_argument('--salida', help="CSV con el resumen por configuración (el detalle por sección va a <salida>.detalle.csv)")
+    args = parser.parse_args()
+
+    rejilla = {
+        'factors': args.factors,
+        'regularization': args.regularization,
+        'iterations': args.iterations,
+        'top': args.top
+    }
+    detalle, resumen = barrer(args.datos or obtener_archivo('datos.csv'), rejilla, args.secciones, args.k, args.semilla,
+                              args.max_consultas, args.procesos, args.calidad)
+    if resumen.empty:
+        print("No hay secciones con datos suficientes.")
+    else:
+        print(resumen.to_string(float_format='{:.4f}'.format))
+        if args.salida:
+            resumen.to_csv(args.salida, index=False)
+            detalle.to_csv(os.path.splitext(args.salida)[0] + '.detalle.csv', index=False)
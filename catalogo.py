@@ -0,0 +1,40 @@
+import pandas as pd
+from instrumentacion import medido
+
+# Índices de productos construidos una sola vez al cargar las transacciones,
+# para resolver descripciones, precios y costos sin recorrer toda la tabla en cada consulta.
+
+COLUMNAS_CATALOGO = ['DESC_PRODUCTO', 'VALOR_PVSI', 'COSTO', 'SECCION', 'DESC_CLASE']
+
+# Pasar las columnas categóricas a su tipo base: en tablas de una fila por producto no ahorran
+# memoria y los índices de texto plano son más rápidos de consultar
+def _sin_categorias(df):
+    return df.astype({
+        columna: tipo.categories.dtype
+        for columna, tipo in df.dtypes.items()
+        if isinstance(tipo, pd.CategoricalDtype)
+    })
+
+# Catálogo de productos indexado por COD_PRODUCTO.
+# Se conserva la primera aparición de cada producto, igual que df[df['COD_PRODUCTO'] == id][...].values[0]
+@medido()
+def construir_catalogo(df):
+    catalogo = _sin_categorias(df.drop_duplicates('COD_PRODUCTO')[['COD_PRODUCTO'] + COLUMNAS_CATALOGO])
+    return catalogo.set_index('COD_PRODUCTO')
+
+# Índice DESC_PRODUCTO → COD_PRODUCTO (primera aparición de cada descripción)
+@medido()
+def construir_indice_descripciones(df):
+    indice = _sin_categorias(df.drop_duplicates('DESC_PRODUCTO')[['DESC_PRODUCTO', 'COD_PRODUCTO']])
+    return indice.set_index('DESC_PRODUCTO')['COD_PRODUCTO']
+
+# Índice jerárquico SECCION → DESC_CLASE → [DESC_PRODUCTO] para los selectores de la página 1.
+# Clases y productos conservan el orden de primera aparición, igual que df_categoria[...].unique()
+@medido()
+def construir_indice_selectores(df):
+    columnas = ['SECCION', 'DESC_CLASE', 'DESC_PRODUCTO']
+    unicos = _sin_categorias(df.drop_duplicates(columnas)[columnas])
+    indice = {}
+    for (seccion, clase), grupo in unicos.groupby(['SECCION', 'DESC_CLASE'], sort=False, dropna=False):
+        indice.setdefault(int(seccion), {})[clase] = grupo['DESC_PRODUCTO'].tolist()
+    return indice
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from instrumentacion import medido
+
+# Precio, costo y margen de los combos calculados de forma vectorizada sobre el catálogo de productos.
+# Los valores se guardan con su tipo numérico; el formato de texto se aplica solo al mostrarlos.
+
+# Aplanar las recomendaciones {producto A: [productos B]} en dos listas de códigos alineadas,
+# respetando el orden de los productos seleccionados
+def pares_recomendados(productos_ids, recomendaciones):
+    codigos_a, codigos_b = [], []
+    for producto_id in productos_ids:
+        for recomendacion_id in recomendaciones.get(producto_id, []):
+            codigos_a.append(producto_id)
+            codigos_b.append(recomendacion_id)
+    return codigos_a, codigos_b
+
+# Calcular los combos (A, B) en una sola pasada sobre los arreglos del catálogo
+@medido()
+def calcular_combos(catalogo, codigos_a, codigos_b):
+    codigos_a = np.asarray(codigos_a, dtype=catalogo.index.dtype)
+    codigos_b = np.asarray(codigos_b, dtype=catalogo.index.dtype)
+    posiciones_a = catalogo.index.get_indexer(codigos_a)
+    posiciones_b = catalogo.index.get_indexer(codigos_b)
+    faltantes = np.concatenate([codigos_a[posiciones_a < 0], codigos_b[posiciones_b < 0]])
+    if len(faltantes) > 0:
+        raise KeyError(f"Productos no encontrados en el catálogo: {sorted(set(faltantes.tolist()))}")
+
+    descripciones = catalogo['DESC_PRODUCTO'].to_numpy()
+    precios = catalogo['VALOR_PVSI'].to_numpy(dtype=np.float64)
+    costos = catalogo['COSTO'].to_numpy(dtype=np.float64)
+    precio_combo = precios[posiciones_a] + precios[posiciones_b]
+    costo_combo = costos[posiciones_a] + costos[posiciones_b]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen_combo = np.round((precio_combo - costo_combo) / precio_combo * 100, 2)
+
+    return pd.DataFrame({
+        'COD_PRODUCTO_A': codigos_a,
+        'COD_PRODUCTO_B': codigos_b,
+        'Producto A': descripciones[posiciones_a],
+        'Producto B': descripciones[posiciones_b],
+        'precio_combo': precio_combo,
+        'costo_combo': costo_combo,
+        'margen_combo': margen_combo
+    })
+
+# Dar formato de texto a los combos para mostrarlos en la tabla
+def formatear_combos(df_combos, columna_margen='Margen'):
+    return pd.DataFrame({
+        'Producto A': df_combos['Producto A'],
+        'Producto B': df_combos['Producto B'],
+        'Precio Combo': df_combos['precio_combo'].map(lambda precio: f"${precio:.2f}"),
+        columna_margen: df_combos['margen_combo'].map(lambda margen: f"{margen}%")
+    }, index=df_combos.index)
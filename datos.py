@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pandas as pd
+from instrumentacion import medido
+
+# Carga tipada de datos.csv y ventas_mensuales.csv.
+# Solo se leen las columnas que usan las aplicaciones, con tipos explícitos (códigos enteros de 32 bits,
+# montos float32 y descripciones como categorías), y la primera carga se guarda en formato Feather
+# junto al CSV para que las siguientes no tengan que volver a interpretar el texto.
+# La copia Feather se escribe sin comprimir para poder mapearla en memoria (mapear=True): las columnas quedan
+# como vistas de solo lectura sobre el archivo y varios procesos comparten las mismas páginas.
+
+VERSION_ESQUEMA = 2
+
+ESQUEMA_DATOS = {
+    'COD_FACTURA': 'int64',  # se reduce a int32 si los códigos caben
+    'COD_PRODUCTO': 'int32',
+    'CANTIDAD': 'float32',
+    'SECCION': 'int32',
+    'DESC_CLASE': 'category',
+    'DESC_PRODUCTO': 'category',
+    'VALOR_PVSI': 'float32',
+    'COSTO': 'float32'
+}
+
+ESQUEMA_VENTAS = {
+    'COD_PRODUCTO': 'int32',
+    'Cantidad Vendida': 'float32',
+    'Precio Total': 'float32',
+    'Costo total': 'float32'
+}
+
+
+# Reducir las columnas enteras al tipo más pequeño de 32 bits o más que contenga sus valores
+def _reducir_enteros(df, columnas):
+    for columna in columnas:
+        if columna in df and df[columna].dtype == np.int64:
+            minimo, maximo = df[columna].min(), df[columna].max()
+            limites = np.iinfo(np.int32)
+            if len(df) == 0 or (minimo >= limites.min and maximo <= limites.max):
+                df[columna] = df[columna].astype(np.int32)
+    return df
+
+
+def ruta_cache(ruta_csv):
+    return os.path.splitext(ruta_csv)[0] + f'.v{VERSION_ESQUEMA}.feather'
+
+
+# Leer la copia Feather si existe y es más reciente que el CSV (None si no hay copia vigente o falta pyarrow).
+# Con mapear=True el archivo se mapea en memoria y las columnas no se copian
+def _leer_cache(ruta_csv, mapear=False):
+    cache = ruta_cache(ruta_csv)
+    try:
+        if os.path.getmtime(cache) < os.path.getmtime(ruta_csv):
+            return None
+        if not mapear:
+            return pd.read_feather(cache)
+        from pyarrow import feather
+        return feather.read_table(cache, memory_map=True).to_pandas(split_blocks=True)
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def _escribir_cache(df, ruta_csv):
+    cache = ruta_cache(ruta_csv)
+    temporal = cache + '.tmp'
+    try:
+        df.reset_index(drop=True).to_feather(temporal, compression='uncompressed')
+        os.replace(temporal, cache)
+    except (OSError, ImportError, ValueError):
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+# Cargar un CSV con el esquema indicado, usando la copia Feather cuando esté vigente.
+# Con mapear=True la tabla devuelta es de solo lectura y comparte memoria con la copia Feather
+@medido()
+def cargar_tabla(ruta_csv, esquema, columnas_extra=(), usar_cache=True, mapear=False):
+    columnas_requeridas = list(esquema) + list(columnas_extra)
+    if usar_cache:
+        df = _leer_cache(ruta_csv, mapear)
+        if df is not None and all(columna in df for columna in columnas_requeridas):
+            return df
+    columnas = set(esquema) | set(columnas_extra)
+    df = pd.read_csv(ruta_csv, usecols=lambda columna: columna in columnas, dtype=esquema)
+    df = _reducir_enteros(df, esquema)
+    if usar_cache:
+        _escribir_cache(df, ruta_csv)
+        if mapear:
+            mapeada = _leer_cache(ruta_csv, mapear)
+            if mapeada is not None and all(columna in mapeada for columna in columnas_requeridas):
+                return mapeada
+    return df
+
+
+# Cargar las transacciones (datos.csv)
+def cargar_transacciones(ruta_csv='datos.csv', usar_cache=True, mapear=False):
+    return cargar_tabla(ruta_csv, ESQUEMA_DATOS, usar_cache=usar_cache, mapear=mapear)
+
+
+# Cargar las ventas mensuales por producto (ventas_mensuales.csv)
+def cargar_ventas(ruta_csv='ventas_mensuales.csv', columnas_extra=(), usar_cache=True, mapear=False):
+    return cargar_tabla(ruta_csv, ESQUEMA_VENTAS, columnas_extra, usar_cache, mapear)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from registro_modelos import registro
+
+# Entrenamientos en segundo plano para que la interfaz no quede bloqueada mientras se ajusta un modelo.
+# Cada trabajo se identifica con la clave del registro de modelos: si varias sesiones piden la misma sección
+# mientras se entrena, todas reciben el mismo trabajo en curso. Al terminar, el modelo queda en el registro
+# y el trabajo se retira de la lista de trabajos en curso.
+#
+# Variables de entorno:
+#   ENTRENAMIENTO_HILOS   entrenamientos simultáneos (por defecto 2)
+
+MAX_TRABAJOS = int(os.environ.get('ENTRENAMIENTO_HILOS', 2))
+
+
+class TrabajoEntrenamiento:
+
+    def __init__(self, clave, total_iteraciones=None):
+        self.clave = clave
+        self.estado = 'en_cola'
+        self.iteracion = 0
+        self.total_iteraciones = total_iteraciones
+        self.inicio = time.time()
+        self.fin = None
+        self.resultado = None
+        self.error = None
+        self._terminado = threading.Event()
+
+    # Callback por iteración con la firma de AlternatingLeastSquares.fit(callback=...)
+    def informar(self, iteracion, tiempo=None, perdida=None):
+        self.estado = 'entrenando'
+        self.iteracion = iteracion + 1
+
+    def progreso(self):
+        if self.terminado():
+            return 1.0
+        if not self.total_iteraciones:
+            return 0.0
+        return min(self.iteracion / self.total_iteraciones, 1.0)
+
+    def terminado(self):
+        return self._terminado.is_set()
+
+    def esperar(self, tiempo=None):
+        self._terminado.wait(tiempo)
+        return self.resultado
+
+    def segundos(self):
+        return (self.fin or time.time()) - self.inicio
+
+    def _terminar(self, resultado=None, error=None):
+        self.resultado = resultado
+        self.error = error
+        self.estado = 'error' if error is not None else 'listo'
+        self.fin = time.time()
+        self._terminado.set()
+
+
+class EntrenamientosEnFondo:
+
+    def __init__(self, max_trabajos=MAX_TRABAJOS):
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix='entrenamiento')
+        self._lock = threading.Lock()
+        self._en_curso = {}
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._en_curso
+
+    # Devolver el trabajo de la clave: terminado si el modelo ya está en el registro, el trabajo en curso si
+    # otra sesión ya lo pidió, o uno nuevo. entrenar(trabajo) recibe el trabajo para informar su progreso
+    def solicitar(self, clave, entrenar, total_iteraciones=None):
+        with self._lock:
+            trabajo = self._en_curso.get(clave)
+            if trabajo is not None:
+                return trabajo
+            trabajo = TrabajoEntrenamiento(clave, total_iteraciones)
+            valor = registro.obtener(clave)
+            if valor is not None:
+                trabajo._terminar(valor)
+                return trabajo
+            self._en_curso[clave] = trabajo
+        self._ejecutor.submit(self._ejecutar, trabajo, entrenar)
+        return trabajo
+
+    def _ejecutar(self, trabajo, entrenar):
+        resultado, error = None, None
+        try:
+            trabajo.estado = 'entrenando'
+            resultado = registro.obtener_o_entrenar(trabajo.clave, lambda: entrenar(trabajo))
+        except Exception as excepcion:
+            error = excepcion
+        finally:
+            with self._lock:
+                self._en_curso.pop(trabajo.clave, None)
+            trabajo._terminar(resultado, error)
+
+    def en_curso(self):
+        with self._lock:
+            return list(self._en_curso.values())
+
+
+# Ejecutor único del proceso, compartido por todas las sesiones como el registro de modelos
+entrenamientos = EntrenamientosEnFondo()
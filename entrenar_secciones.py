@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from recomendador import secciones, HIPERPARAMETROS_ALS, filtrar_por_categoria, obtener_top_200_productos, preparar_datos_para_entrenar, entrenar_modelo_als, muestrear_facturas
+from registro_modelos import huella_archivo
+from datos import cargar_transacciones
+from fuentes_datos import obtener_archivo
+from ingesta import ingerir_por_bloques, TAMANO_BLOQUE
+from artefactos import guardar_artefactos, DIRECTORIO_ARTEFACTOS
+
+# Entrenamiento fuera de línea de todas las secciones.
+# Guarda los modelos como artefactos versionados para que las aplicaciones solo tengan que mapearlos en memoria.
+# Con --por-bloques el CSV se lee en una sola pasada por bloques, para archivos que no caben en memoria.
+# Cada sección se entrena en un proceso propio, así la memoria pico informada es la de esa sección.
+# Con --procesos N las secciones se entrenan a la vez en N procesos; cada uno usa núcleos/N hilos de implicit
+# y BLAS limitado a un hilo, para no tener más hilos que núcleos.
+# Con --proporcion P < 1 cada sección se entrena con una muestra de facturas completas (para experimentos);
+# por defecto se usan todas.
+#
+# Uso: python entrenar_secciones.py --datos datos.csv --salida artefactos [--por-bloques] [--procesos 4]
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# Matrices de entrenamiento (seccion, productos, matriz, facturas) de cada sección
+def matrices_por_seccion(ruta_datos, n_productos=200, por_bloques=False, tamano_bloque=TAMANO_BLOQUE, proporcion=1.0, semilla=42):
+    if por_bloques:
+        ingesta = ingerir_por_bloques(ruta_datos, n_productos, tamano_bloque)
+        for seccion, (matriz, facturas, productos) in ingesta['matrices'].items():
+            matriz, facturas = muestrear_facturas(matriz, facturas, proporcion, semilla)
+            yield seccion, productos, matriz, facturas
+        return
+    df = cargar_transacciones(ruta_datos)
+    for categoria, seccion in secciones.items():
+        compras = preparar_datos_para_entrenar(obtener_top_200_productos(filtrar_por_categoria(df, categoria), n_productos),
+                                               proporcion, semilla)
+        if compras is not None:
+            matriz, facturas, productos = compras
+            yield seccion, productos, matriz, facturas
+
+
+# Limitar BLAS a un hilo mientras se entrena: implicit ya reparte el trabajo en sus propios hilos
+def limitar_hilos_blas():
+    if threadpool_limits is None:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=1, user_api='blas')
+
+
+# Memoria residente máxima del proceso en MB (ru_maxrss está en KB en Linux y en bytes en macOS)
+def memoria_pico_mb():
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+# Entrenar y guardar una sección. Devuelve (seccion, destino, segundos, memoria pico en MB)
+def entrenar_y_guardar(seccion, productos, matriz, facturas, huella, hiperparametros, directorio, hilos=0, origen=None,
+                       top_productos=None):
+    inicio = time.time()
+    with limitar_hilos_blas():
+        als_model = entrenar_modelo_als(matriz, hiperparametros, hilos)
+    destino = guardar_artefactos(seccion, productos, als_model, matriz, huella, hiperparametros, directorio, facturas, origen,
+                                 top_productos)
+    return seccion, destino, time.time() - inicio, memoria_pico_mb()
+
+
+def entrenar_todas(ruta_datos, directorio=DIRECTORIO_ARTEFACTOS, hiperparametros=HIPERPARAMETROS_ALS, n_productos=200,
+                   por_bloques=False, tamano_bloque=TAMANO_BLOQUE, procesos=1, proporcion=1.0, semilla=42):
+    huella = huella_archivo(ruta_datos)
+    categorias = {seccion: categoria for categoria, seccion in secciones.items()}
+    matrices = matrices_por_seccion(ruta_datos, n_productos, por_bloques, tamano_bloque, proporcion, semilla)
+    # Dejar constancia en el manifiesto cuando el modelo no se entrenó con todas las facturas
+    origen = {'modo': 'muestra', 'proporcion_facturas': proporcion, 'semilla': semilla} if proporcion < 1 else None
+    tamanos = {}
+    resultados = {}
+    inicio = time.time()
+
+    def informar(seccion, destino, segundos, memoria):
+        n_productos_seccion, n_facturas = tamanos[seccion]
+        resultados[seccion] = destino
+        print(f"{categorias.get(seccion, seccion)} (sección {seccion}): {n_productos_seccion} productos, {n_facturas} facturas, "
+              f"{segundos:.1f} s, {memoria:.0f} MB pico -> {destino}")
+
+    hilos = max(1, (os.cpu_count() or 1) // max(1, procesos))
+    # Un proceso nuevo por sección, también con --procesos 1, para que la memoria pico de cada una no incluya
+    # la carga de los datos ni las secciones anteriores. Con un solo proceso se espera cada sección antes de
+    # armar la siguiente, así que hay una sola matriz a la vez en memoria
+    with ProcessPoolExecutor(max_workers=max(1, procesos), max_tasks_per_child=1) as ejecutor:
+        tareas = []
+        for seccion, productos, matriz, facturas in matrices:
+            tamanos[seccion] = (len(productos), matriz.shape[0])
+            tarea = ejecutor.submit(entrenar_y_guardar, seccion, productos, matriz, facturas, huella, hiperparametros,
+                                    directorio, hilos, origen, n_productos or 0)
+            if procesos <= 1:
+                informar(*tarea.result())
+            else:
+                tareas.append(tarea)
+        for tarea in as_completed(tareas):
+            informar(*tarea.result())
+
+    for categoria, seccion in secciones.items():
+        if seccion not in resultados:
+            print(f"{categoria} (sección {seccion}): sin datos suficientes, se omite.")
+    print(f"Total: {len(resultados)} secciones en {time.time() - inicio:.1f} s, {memoria_pico_mb():.0f} MB pico en el proceso principal")
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Entrena el modelo ALS de cada sección y guarda los artefactos.")
+    parser.add_argument('--datos', help="Archivo de transacciones (por defecto la copia local de datos.csv)")
+    parser.add_argument('--salida', default=DIRECTORIO_ARTEFACTOS, help="Directorio de artefactos")
+    parser.add_argument('--top', type=int, default=200, help="Productos más vendidos por sección (0 = toda la sección)")
+    parser.add_argument('--por-bloques', action='store_true', help="Leer el CSV por bloques sin cargarlo completo en memoria")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE, help="Filas por bloque en la lectura por bloques")
+    parser.add_argument('--procesos', type=int, default=1, help="Secciones entrenadas en paralelo")
+    parser.add_argument('--proporcion', type=float, default=1.0, help="Proporción de facturas para entrenar (por defecto todas)")
+    parser.add_argument('--semilla', type=int, default=42, help="Semilla de la muestra de facturas")
+    args = parser.parse_args()
+    if not 0 < args.proporcion <= 1:
+        parser.error("--proporcion debe estar en (0, 1]")
+    entrenar_todas(args.datos or obtener_archivo('datos.csv'), args.salida, n_productos=args.top or None,
+                   por_bloques=args.por_bloques, tamano_bloque=args.tamano_bloque, procesos=args.procesos,
+                   proporcion=args.proporcion, semilla=args.semilla)
@@ -0,0 +1,143 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from recomendador import secciones, HIPERPARAMETROS_ALS, filtrar_por_categoria, obtener_top_200_productos, construir_matriz_compras, entrenar_modelo_als
+from datos import cargar_transacciones
+from fuentes_datos import obtener_archivo
+from similitud import motor_similitud
+
+# Evaluación fuera de línea de los complementos recomendados.
+# Las facturas se reparten entre entrenamiento y prueba (todas las líneas de una factura quedan del mismo lado).
+# En cada factura de prueba con dos o más productos del modelo, cada producto se usa como consulta y los demás
+# productos de la misma factura son los complementos relevantes. Se calculan precision@k, recall@k, MAP@k y
+# NDCG@k, junto con el tiempo de entrenamiento y de inferencia.
+#
+# Uso: python evaluacion.py --datos datos.csv --k 5 [--salida evaluacion.json]
+
+
+# Repartir las facturas al azar: devuelve (df_entrenamiento, df_prueba)
+def dividir_por_factura(df, proporcion_prueba=0.3, semilla=42):
+    facturas = df['COD_FACTURA'].unique()
+    rng = np.random.default_rng(semilla)
+    prueba = rng.random(len(facturas)) < proporcion_prueba
+    en_prueba = df['COD_FACTURA'].isin(facturas[prueba])
+    return df[~en_prueba], df[en_prueba]
+
+
+# Consultas de evaluación a partir de las facturas de prueba, con los productos en las columnas del modelo.
+# Devuelve (relevantes, filas, posiciones): la consulta i es el producto posiciones[i] de la factura filas[i] y
+# relevantes tiene las compras de prueba codificadas como fila * len(productos) + columna
+def construir_consultas(df_prueba, productos, max_consultas=None, semilla=42):
+    df_prueba = df_prueba[df_prueba['COD_PRODUCTO'].isin(productos)]
+    matriz, _, productos_prueba = construir_matriz_compras(df_prueba)
+    # Llevar las columnas a las posiciones del modelo
+    matriz = matriz.tocoo()
+    columnas = productos.get_indexer(productos_prueba)[matriz.col]
+    filas = matriz.row
+    con_complementos = np.bincount(filas, minlength=matriz.shape[0]) >= 2
+    validas = con_complementos[filas]
+    filas, columnas = filas[validas], columnas[validas]
+    if max_consultas is not None and len(filas) > max_consultas:
+        elegidas = np.sort(np.random.default_rng(semilla).choice(len(filas), max_consultas, replace=False))
+        filas_consulta, posiciones = filas[elegidas], columnas[elegidas]
+    else:
+        filas_consulta, posiciones = filas, columnas
+    relevantes = np.unique(filas.astype(np.int64) * len(productos) + columnas)
+    return relevantes, filas_consulta, posiciones
+
+
+# Métricas de ranking con relevancia binaria.
+# aciertos[i, j] indica si la recomendación j de la consulta i es relevante; n_relevantes[i] cuántos hay
+def metricas_ranking(aciertos, n_relevantes):
+    if len(aciertos) == 0:
+        return {'precision': float('nan'), 'recall': float('nan'), 'map': float('nan'), 'ndcg': float('nan')}
+    k = aciertos.shape[1]
+    aciertos = aciertos.astype(np.float64)
+    n_relevantes = np.asarray(n_relevantes, dtype=np.float64)
+    acumulados = np.cumsum(aciertos, axis=1)
+    precision_en = acumulados / np.arange(1, k + 1)
+    descuentos = 1.0 / np.log2(np.arange(2, k + 2))
+    ideales = np.cumsum(descuentos)[np.minimum(n_relevantes, k).astype(int) - 1]
+    return {
+        'precision': float(np.mean(acumulados[:, -1] / k)),
+        'recall': float(np.mean(acumulados[:, -1] / n_relevantes)),
+        'map': float(np.mean((precision_en * aciertos).sum(axis=1) / np.minimum(n_relevantes, k))),
+        'ndcg': float(np.mean((aciertos * descuentos).sum(axis=1) / ideales))
+    }
+
+
+# Evaluar los complementos de un modelo ya entrenado sobre las facturas de prueba
+def evaluar_modelo(productos, als_model, df_prueba, k=5, max_consultas=None, semilla=42, busqueda='exacta'):
+    relevantes, filas, posiciones = construir_consultas(df_prueba, productos, max_consultas, semilla)
+    if len(filas) == 0:
+        return dict(metricas_ranking(np.zeros((0, k), dtype=bool), []), consultas=0, inferencia_ms=float('nan'))
+    inicio = time.perf_counter()
+    motor = motor_similitud(productos, als_model, busqueda=busqueda)
+    indices, _ = motor.puntuar(posiciones, k)
+    inferencia = time.perf_counter() - inicio
+
+    claves = filas.astype(np.int64)[:, None] * len(productos) + indices
+    aciertos = np.isin(claves, relevantes) & (indices >= 0)
+    # Los relevantes de cada consulta son los otros productos de su factura
+    n_relevantes = np.bincount(relevantes // len(productos))[filas] - 1
+    return dict(
+        metricas_ranking(aciertos, n_relevantes),
+        consultas=int(len(filas)),
+        inferencia_ms=inferencia * 1000 / len(filas)
+    )
+
+
+# Entrenar con las facturas de entrenamiento de la sección y evaluar con las de prueba
+def evaluar_seccion(df_seccion, hiperparametros=HIPERPARAMETROS_ALS, n_productos=200, k=5, proporcion_prueba=0.3, semilla=42,
+                    max_consultas=None, num_threads=0):
+    df_entrenamiento, df_prueba = dividir_por_factura(df_seccion, proporcion_prueba, semilla)
+    df_top = obtener_top_200_productos(df_entrenamiento, n_productos)
+    if df_top.empty:
+        return None
+    matriz, _, productos = construir_matriz_compras(df_top)
+    inicio = time.perf_counter()
+    # Con un callback vacío fit no dibuja la barra de progreso
+    als_model = entrenar_modelo_als(matriz, dict(hiperparametros, random_state=semilla), num_threads,
+                                    callback=lambda *_: None)
+    entrenamiento = time.perf_counter() - inicio
+    resultado = evaluar_modelo(productos, als_model, df_prueba, k, max_consultas, semilla)
+    resultado.update({
+        'k': k,
+        'productos': int(len(productos)),
+        'facturas_entrenamiento': int(matriz.shape[0]),
+        'entrenamiento_s': entrenamiento
+    })
+    return resultado
+
+
+def evaluar_todas(df, hiperparametros=HIPERPARAMETROS_ALS, n_productos=200, k=5, proporcion_prueba=0.3, semilla=42, max_consultas=None):
+    resultados = {}
+    for categoria, seccion in secciones.items():
+        resultado = evaluar_seccion(filtrar_por_categoria(df, categoria), hiperparametros, n_productos, k, proporcion_prueba,
+                                    semilla, max_consultas)
+        if resultado is not None:
+            resultados[seccion] = dict(resultado, categoria=categoria)
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evalúa los complementos del modelo ALS con facturas de prueba.")
+    parser.add_argument('--datos', help="Archivo de transacciones (por defecto la copia local de datos.csv)")
+    parser.add_argument('--k', type=int, default=5, help="Complementos evaluados por producto")
+    parser.add_argument('--top', type=int, default=200, help="Productos más vendidos por sección (0 = toda la sección)")
+    parser.add_argument('--prueba', type=float, default=0.3, help="Proporción de facturas de prueba")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--max-consultas', type=int, help="Consultas muestreadas por sección")
+    parser.add_argument('--salida', help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    df = cargar_transacciones(args.datos or obtener_archivo('datos.csv'))
+    resultados = evaluar_todas(df, HIPERPARAMETROS_ALS, args.top or None, args.k, args.prueba, args.semilla, args.max_consultas)
+    tabla = pd.DataFrame.from_dict(resultados, orient='index')
+    print(tabla[['categoria', 'precision', 'recall', 'map', 'ndcg', 'consultas', 'entrenamiento_s', 'inferencia_ms']]
+          .to_string(float_format='{:.4f}'.format))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({'hiperparametros': HIPERPARAMETROS_ALS, 'resultados': resultados}, archivo, indent=2, ensure_ascii=False)
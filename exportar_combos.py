@@ -0,0 +1,232 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from recomendador import secciones, HIPERPARAMETROS_ALS, obtener_top_200_productos, preparar_datos_para_entrenar, entrenar_modelo_als, recomendar_bloque
+from registro_modelos import huella_archivo
+from datos import cargar_transacciones, cargar_ventas
+from fuentes_datos import obtener_archivo
+from catalogo import construir_catalogo
+from combos import calcular_combos
+from ventas import agregar_ventas_por_producto, resumir_combos
+from artefactos import cargar_artefactos, cargar_manifiesto, guardar_artefactos, DIRECTORIO_ARTEFACTOS
+from servicio import COLUMNAS_COMBO
+from entrenar_secciones import limitar_hilos_blas
+
+# Exportación masiva del catálogo de combos: para cada producto de cada sección, sus N complementos con el
+# precio y margen de la página 2 y las estimaciones de ventas mensuales de la página 3.
+# Por defecto entran todos los productos de la sección (--top 0); con --top K, solo los K más vendidos.
+# Se reutilizan los artefactos compartidos si fueron entrenados con los mismos datos, hiperparámetros y corte
+# de productos; si no, la sección se entrena antes de empezar y el modelo se guarda en <salida>/modelos (o en
+# --modelos), nunca en los artefactos compartidos: así la exportación no cambia el modelo de las aplicaciones.
+# Cada sección se divide en partes de --tamano-bloque productos A que se calculan en un conjunto de procesos
+# y se escriben a medida que terminan, de modo que la memoria queda acotada por el tamaño de una parte y no
+# por el de la sección.
+#
+# Salida: <salida>/seccion_<n>/parte_<k>.csv|parquet y <salida>/exportacion.json con la configuración y las
+# versiones de los modelos. Cada parte se escribe de forma atómica; al repetir el mismo comando se saltan
+# las partes ya escritas, así que una exportación interrumpida continúa donde quedó. Si cambió el modelo de
+# una sección, sus partes se vuelven a generar. Un directorio de partes Parquet se lee con pd.read_parquet.
+#
+# Uso: python exportar_combos.py --salida combos [--formato parquet] [--n 5] [--top 0] [--procesos 4] [--secciones 24 25]
+
+TAMANO_BLOQUE = 500
+FORMATOS = ('csv', 'parquet')
+COLUMNAS_EXPORTACION = ['SECCION'] + COLUMNAS_COMBO[:2] + ['posicion', 'puntaje'] + COLUMNAS_COMBO[2:]
+
+_catalogo = None
+_agregados = None
+_directorios = {}
+_modelos = {}
+
+
+def _iniciar_proceso(catalogo, agregados, directorios):
+    global _catalogo, _agregados, _directorios
+    _catalogo = catalogo
+    _agregados = agregados
+    _directorios = directorios
+
+
+# Modelo de la sección en este proceso, mapeado una sola vez desde el directorio de artefactos elegido
+def _modelo(seccion):
+    if seccion not in _modelos:
+        _modelos[seccion] = cargar_artefactos(seccion, directorio=_directorios[seccion])
+    return _modelos[seccion]
+
+
+def ruta_parte(salida, seccion, parte, formato):
+    return os.path.join(salida, f'seccion_{seccion}', f'parte_{parte:05d}.{formato}')
+
+
+# Escribir una parte en un temporal y renombrarla: una parte existente siempre está completa
+def escribir_parte(tabla, ruta, formato):
+    temporal = ruta + '.tmp'
+    if formato == 'parquet':
+        tabla.to_parquet(temporal, index=False)
+    else:
+        tabla.to_csv(temporal, index=False)
+    os.replace(temporal, ruta)
+
+
+# Combos de los productos A en las posiciones [inicio, fin) del modelo de la sección, con margen y estimaciones
+def combos_bloque(seccion, productos, als_model, inicio, fin, N, catalogo, agregados):
+    pares = recomendar_bloque(productos, als_model, inicio, fin, N)
+    combos = calcular_combos(catalogo, pares['COD_PRODUCTO_A'], pares['COD_PRODUCTO_B'])
+    resumen = resumir_combos(combos, agregados)
+    tabla = pd.concat([combos, resumen.drop(columns='Combo')], axis=1)
+    tabla['SECCION'] = seccion
+    tabla['posicion'] = pares['posicion'].to_numpy()
+    tabla['puntaje'] = pares['puntaje'].to_numpy()
+    return tabla[COLUMNAS_EXPORTACION]
+
+
+def _exportar_parte(seccion, parte, inicio, fin, N, ruta, formato):
+    productos, als_model, _ = _modelo(seccion)
+    with limitar_hilos_blas():
+        tabla = combos_bloque(seccion, productos, als_model, inicio, fin, N, _catalogo, _agregados)
+    escribir_parte(tabla, ruta, formato)
+    return seccion, parte, len(tabla)
+
+
+def _leer_json(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_json(ruta, contenido):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(contenido, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+# Elegir para cada sección un modelo entrenado con sus top productos más vendidos (0 = todos): el de los
+# artefactos compartidos si coincide, si no uno propio de la exportación en directorio_modelos, entrenándolo
+# y guardándolo (con sus facturas) si falta. Devuelve {seccion: (directorio, manifiesto)}
+def preparar_modelos(df, huella, hiperparametros, secciones_exportar, directorio_artefactos, directorio_modelos, top=0):
+    elegidos = {}
+    for seccion in secciones_exportar:
+        directorio = next((
+            candidato for candidato in (directorio_artefactos, directorio_modelos)
+            if cargar_artefactos(seccion, huella, hiperparametros, candidato, top) is not None
+        ), None)
+        if directorio is None:
+            print(f"Sección {seccion}: sin artefactos vigentes con --top {top}, entrenando...")
+            compras = preparar_datos_para_entrenar(obtener_top_200_productos(df[df['SECCION'] == seccion], top or None))
+            if compras is None:
+                print(f"Sección {seccion}: sin datos suficientes, se omite")
+                continue
+            matriz, facturas, productos = compras
+            als_model = entrenar_modelo_als(matriz, hiperparametros)
+            guardar_artefactos(seccion, productos, als_model, matriz, huella, hiperparametros, directorio_modelos,
+                               facturas, origen={'modo': 'exportar_combos'}, top_productos=top)
+            directorio = directorio_modelos
+        elegidos[seccion] = (directorio, cargar_manifiesto(seccion, directorio))
+    return elegidos
+
+
+def exportar(salida, ruta_datos=None, ruta_ventas=None, hiperparametros=HIPERPARAMETROS_ALS, N=5, formato='csv',
+             tamano_bloque=TAMANO_BLOQUE, procesos=None, secciones_exportar=None,
+             directorio_artefactos=DIRECTORIO_ARTEFACTOS, reiniciar=False, top=0, directorio_modelos=None):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato} (se admite {', '.join(FORMATOS)})")
+    ruta_datos = ruta_datos or obtener_archivo('datos.csv')
+    ruta_ventas = ruta_ventas or obtener_archivo('ventas_mensuales.csv')
+    procesos = procesos or os.cpu_count() or 1
+    secciones_exportar = secciones_exportar or list(secciones.values())
+    huella = huella_archivo(ruta_datos)
+    # Las estimaciones de venta dependen de ventas_mensuales.csv: su huella también identifica la exportación
+    configuracion = {'huella_datos': huella, 'huella_ventas': huella_archivo(ruta_ventas),
+                     'hiperparametros': dict(hiperparametros), 'top': top, 'N': N, 'formato': formato,
+                     'tamano_bloque': tamano_bloque}
+
+    ruta_estado = os.path.join(salida, 'exportacion.json')
+    directorio_modelos = directorio_modelos or os.path.join(salida, 'modelos')
+    if reiniciar and os.path.isdir(salida):
+        shutil.rmtree(salida)
+    os.makedirs(salida, exist_ok=True)
+    estado = _leer_json(ruta_estado)
+    if estado is not None and estado['configuracion'] != configuracion:
+        raise ValueError(f"{salida} tiene una exportación con otra configuración; use --reiniciar o otro directorio")
+
+    df = cargar_transacciones(ruta_datos, mapear=True)
+    elegidos = preparar_modelos(df, huella, hiperparametros, secciones_exportar, directorio_artefactos,
+                                directorio_modelos, top)
+    catalogo = construir_catalogo(df)
+    agregados = agregar_ventas_por_producto(cargar_ventas(ruta_ventas, mapear=True))
+    del df
+
+    anteriores = estado['secciones'] if estado is not None else {}
+    estado = {'configuracion': configuracion, 'secciones': {}, 'completa': False}
+    pendientes = []
+    for seccion, (_, manifiesto) in elegidos.items():
+        partes = -(-manifiesto['n_productos'] // tamano_bloque)
+        anterior = anteriores.get(str(seccion))
+        if anterior is not None and anterior['version'] != manifiesto['version']:
+            # El modelo cambió desde la exportación anterior: sus partes ya no sirven
+            shutil.rmtree(os.path.join(salida, f'seccion_{seccion}'), ignore_errors=True)
+            anterior = None
+        os.makedirs(os.path.join(salida, f'seccion_{seccion}'), exist_ok=True)
+        for temporal in glob.glob(os.path.join(salida, f'seccion_{seccion}', '*.tmp')):
+            os.remove(temporal)
+        filas = anterior['filas'] if anterior is not None else {}
+        estado['secciones'][str(seccion)] = {'version': manifiesto['version'], 'partes': partes, 'filas': filas}
+        for parte in range(partes):
+            ruta = ruta_parte(salida, seccion, parte, formato)
+            if str(parte) not in filas or not os.path.exists(ruta):
+                pendientes.append((seccion, parte, parte * tamano_bloque, (parte + 1) * tamano_bloque, ruta))
+    _escribir_json(ruta_estado, estado)
+
+    total = sum(seccion['partes'] for seccion in estado['secciones'].values())
+    print(f"{total - len(pendientes)}/{total} partes ya exportadas, {len(pendientes)} pendientes")
+    inicio = time.time()
+    directorios = {seccion: directorio for seccion, (directorio, _) in elegidos.items()}
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                             initargs=(catalogo, agregados, directorios)) as ejecutor:
+        tareas = [
+            ejecutor.submit(_exportar_parte, seccion, parte, desde, hasta, N, ruta, formato)
+            for seccion, parte, desde, hasta, ruta in pendientes
+        ]
+        for completadas, tarea in enumerate(as_completed(tareas), 1):
+            seccion, parte, filas = tarea.result()
+            estado['secciones'][str(seccion)]['filas'][str(parte)] = filas
+            _escribir_json(ruta_estado, estado)
+            print(f"\r{completadas}/{len(tareas)} partes ({time.time() - inicio:.0f} s)", end='', flush=True)
+    if tareas:
+        print()
+    estado['completa'] = True
+    _escribir_json(ruta_estado, estado)
+    return estado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta todos los combos de cada sección con margen y estimaciones de venta.")
+    parser.add_argument('--salida', required=True, help="Directorio de salida")
+    parser.add_argument('--datos', help="Archivo de transacciones (por defecto la copia local de datos.csv)")
+    parser.add_argument('--ventas', help="Archivo de ventas mensuales (por defecto la copia local de ventas_mensuales.csv)")
+    parser.add_argument('--artefactos', default=DIRECTORIO_ARTEFACTOS, help="Artefactos compartidos que se reutilizan si coinciden")
+    parser.add_argument('--modelos', help="Directorio de los modelos que entrena la exportación (por defecto <salida>/modelos)")
+    parser.add_argument('--formato', choices=FORMATOS, default='csv')
+    parser.add_argument('--n', type=int, default=5, help="Complementos por producto")
+    parser.add_argument('--top', type=int, default=0, help="Productos más vendidos por sección (0 = toda la sección)")
+    parser.add_argument('--secciones', type=int, nargs='+', help="Secciones a exportar (por defecto todas)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE, help="Productos A por parte")
+    parser.add_argument('--procesos', type=int, help="Procesos en paralelo (por defecto uno por núcleo)")
+    parser.add_argument('--reiniciar', action='store_true', help="Borrar la exportación anterior y empezar de cero")
+    args = parser.parse_args()
+
+    try:
+        estado = exportar(args.salida, args.datos, args.ventas, HIPERPARAMETROS_ALS, args.n, args.formato,
+                          args.tamano_bloque, args.procesos, args.secciones, args.artefactos, args.reiniciar, args.top,
+                          args.modelos)
+    except ValueError as error:
+        parser.error(str(error))
+    for seccion, detalle in estado['secciones'].items():
+        print(f"Sección {seccion}: {sum(detalle['filas'].values()):,} combos en {detalle['partes']} partes")
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from instrumentacion import medido
+
+# Origen de los archivos de datos.
+# Se usa la copia local si existe y coincide con el manifiesto (tamaño y sha256 registrados al descargarla);
+# solo se descarga de Google Drive cuando no hay copia o está dañada. Si la copia está vencida se sirve igual
+# y se refresca en segundo plano, de modo que el arranque no espera a la red si ya hay datos.
+# Una copia modificada localmente después de registrarla (más nueva que el manifiesto, o cualquier cambio con
+# DATOS_OFFLINE=1) se vuelve a registrar como local y no se refresca desde Drive, para no pisar la edición.
+#
+# Variables de entorno:
+#   DATOS_DIR          directorio de los archivos (por defecto el directorio actual)
+#   DATOS_MAX_HORAS    antigüedad máxima antes de refrescar (0 = no refrescar nunca)
+#   DATOS_REINTENTO_MINUTOS  espera tras un refresco fallido antes de volver a intentarlo (por defecto 15)
+#   DATOS_OFFLINE=1    no descargar nunca; falla si falta algún archivo
+
+FUENTES = {
+    'datos.csv': 'https://drive.google.com/uc?id=1NmAZBoSj8YqWFbypAm8HYMj2YHbRyggT',
+    'ventas_mensuales.csv': 'https://drive.google.com/uc?id=1-21lc0LEqQLeph9YmnqIv5dhnDMzV15q'
+}
+
+DIRECTORIO_DATOS = os.environ.get('DATOS_DIR', '.')
+MAX_ANTIGUEDAD = float(os.environ.get('DATOS_MAX_HORAS', 24)) * 3600
+ESPERA_REINTENTO = float(os.environ.get('DATOS_REINTENTO_MINUTOS', 15)) * 60
+MODO_OFFLINE = os.environ.get('DATOS_OFFLINE') == '1'
+MANIFIESTO = 'fuentes.json'
+
+_log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_refrescos_en_curso = set()
+
+
+def ruta_local(nombre, directorio=DIRECTORIO_DATOS):
+    return os.path.join(directorio, nombre)
+
+
+def calcular_sha256(ruta, tamano_bloque=1024 * 1024):
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def _leer_manifiesto(directorio):
+    try:
+        with open(os.path.join(directorio, MANIFIESTO), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def _registrar(nombre, entrada, directorio):
+    with _lock:
+        manifiesto = _leer_manifiesto(directorio)
+        manifiesto[nombre] = entrada
+        temporal = os.path.join(directorio, MANIFIESTO + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(manifiesto, archivo, indent=2)
+        os.replace(temporal, os.path.join(directorio, MANIFIESTO))
+
+
+def _entrada(ruta, url, sha256=None):
+    estado = os.stat(ruta)
+    return {
+        'url': url,
+        'tamano': estado.st_size,
+        'mtime_ns': estado.st_mtime_ns,
+        'sha256': sha256 or calcular_sha256(ruta),
+        'verificado': time.time()
+    }
+
+
+# Comprobar la copia local contra el manifiesto. Si el tamaño y la fecha coinciden no se relee el archivo;
+# si solo cambió la fecha se recalcula el sha256. Una copia sin manifiesto (p. ej. colocada a mano) se acepta,
+# igual que una editada después de registrarla o cualquier cambio en modo offline: se registra como local.
+# Solo se rechaza una copia distinta de la registrada que no es más nueva que el registro
+def copia_valida(nombre, directorio=DIRECTORIO_DATOS):
+    ruta = ruta_local(nombre, directorio)
+    if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+        return False
+    entrada = _leer_manifiesto(directorio).get(nombre)
+    if entrada is None:
+        _registrar(nombre, _entrada(ruta, FUENTES.get(nombre)), directorio)
+        return True
+    estado = os.stat(ruta)
+    if estado.st_size == entrada['tamano'] and estado.st_mtime_ns == entrada.get('mtime_ns'):
+        return True
+    sha256 = calcular_sha256(ruta)
+    if sha256 == entrada['sha256']:
+        _registrar(nombre, dict(entrada, mtime_ns=estado.st_mtime_ns), directorio)
+        return True
+    if MODO_OFFLINE or estado.st_mtime_ns > entrada.get('mtime_ns', 0):
+        _registrar(nombre, dict(_entrada(ruta, entrada.get('url'), sha256), local=True), directorio)
+        return True
+    return False
+
+
+# Una copia vencida no se vuelve a refrescar hasta ESPERA_REINTENTO después del último intento fallido,
+# para no lanzar una descarga en cada ejecución de la página mientras la red no responde
+def copia_vencida(nombre, directorio=DIRECTORIO_DATOS):
+    if MAX_ANTIGUEDAD <= 0:
+        return False
+    entrada = _leer_manifiesto(directorio).get(nombre, {})
+    if entrada.get('local'):
+        return False
+    ahora = time.time()
+    if ahora - entrada.get('intento', 0) < ESPERA_REINTENTO:
+        return False
+    return ahora - entrada.get('verificado', 0) > MAX_ANTIGUEDAD
+
+
+# Descargar a un archivo temporal y reemplazar la copia local solo si el contenido cambió,
+# para no invalidar la caché Feather ni la huella de los modelos cuando los datos son los mismos
+@medido()
+def descargar(nombre, url=None, directorio=DIRECTORIO_DATOS):
+    import gdown
+
+    url = url or FUENTES[nombre]
+    ruta = ruta_local(nombre, directorio)
+    temporal = ruta + '.descarga'
+    try:
+        if gdown.download(url, temporal, quiet=True) is None or os.path.getsize(temporal) == 0:
+            raise OSError(f"No se pudo descargar {nombre} desde {url}")
+        sha256 = calcular_sha256(temporal)
+        entrada = _leer_manifiesto(directorio).get(nombre)
+        if os.path.exists(ruta) and entrada is not None and entrada['sha256'] == sha256:
+            os.remove(temporal)
+            entrada = dict(entrada, verificado=time.time())
+            entrada.pop('intento', None)
+            _registrar(nombre, entrada, directorio)
+        else:
+            os.replace(temporal, ruta)
+            _registrar(nombre, _entrada(ruta, url, sha256), directorio)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return ruta
+
+
+def _refrescar(nombre, url, directorio):
+    try:
+        descargar(nombre, url, directorio)
+    except Exception as error:
+        _log.warning("No se pudo refrescar %s: %s", nombre, error)
+        entrada = _leer_manifiesto(directorio).get(nombre)
+        if entrada is not None:
+            _registrar(nombre, dict(entrada, intento=time.time()), directorio)
+    finally:
+        with _lock:
+            _refrescos_en_curso.discard((nombre, directorio))
+
+
+def refrescar_en_segundo_plano(nombre, url=None, directorio=DIRECTORIO_DATOS):
+    with _lock:
+        if (nombre, directorio) in _refrescos_en_curso:
+            return
+        _refrescos_en_curso.add((nombre, directorio))
+    threading.Thread(target=_refrescar, args=(nombre, url, directorio), daemon=True).start()
+
+
+# Devolver la ruta local de un archivo de datos, descargándolo solo si no hay una copia válida
+def obtener_archivo(nombre, url=None, directorio=DIRECTORIO_DATOS):
+    os.makedirs(directorio, exist_ok=True)
+    if copia_valida(nombre, directorio):
+        if not MODO_OFFLINE and copia_vencida(nombre, directorio):
+            refrescar_en_segundo_plano(nombre, url, directorio)
+        return ruta_local(nombre, directorio)
+    if MODO_OFFLINE:
+        raise FileNotFoundError(f"No hay una copia válida de {nombre} en {directorio} (DATOS_OFFLINE=1)")
+    return descargar(nombre, url, directorio)
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Índices de búsqueda de vecinos sobre los factores de producto.
+# 'exacta' puntúa contra todos los productos; 'ivf' es un índice aproximado de listas invertidas
+# (k-means + sondeo de las listas más cercanas) en NumPy puro, cuya latencia casi no crece con el catálogo.
+# Se pueden agregar otros motores (annoy, faiss, ...) con registrar_backend.
+
+# Por encima de este número de productos la búsqueda 'auto' usa el índice aproximado
+UMBRAL_APROXIMADO = 50000
+RECALL_MINIMO = 0.9
+# Si para llegar al recall hay que sondear más de esta fracción de las listas, la búsqueda exacta es más rápida
+FRACCION_MAXIMA_SONDEO = 0.25
+
+
+# Seleccionar los N mayores puntajes de cada fila con argpartition, ordenados de mayor a menor
+def seleccionar_top_k(puntajes, N):
+    N = min(N, puntajes.shape[1])
+    if N <= 0:
+        vacio = np.empty((puntajes.shape[0], 0), dtype=np.int64)
+        return vacio, vacio.astype(puntajes.dtype)
+    candidatos = np.argpartition(-puntajes, N - 1, axis=1)[:, :N]
+    orden = np.argsort(-np.take_along_axis(puntajes, candidatos, axis=1), axis=1, kind='stable')
+    indices = np.take_along_axis(candidatos, orden, axis=1)
+    return indices, np.take_along_axis(puntajes, indices, axis=1)
+
+
+# Ambos índices devuelven (indices, puntajes) de forma (consultas, N); los huecos quedan con índice -1
+class IndiceExacto:
+
+    def __init__(self, factores):
+        self.factores = factores
+
+    def buscar(self, consultas, N, excluir=None):
+        puntajes = consultas @ self.factores.T
+        if excluir is not None:
+            puntajes[np.arange(len(consultas)), excluir] = -np.inf
+        indices, puntajes = seleccionar_top_k(puntajes, N)
+        indices[np.isneginf(puntajes)] = -1
+        return indices, puntajes
+
+
+class IndiceIVF:
+
+    def __init__(self, factores, n_listas=None, n_sondeos=8, iteraciones=10, semilla=42, tamano_bloque=65536):
+        self.factores = factores
+        n = len(factores)
+        self.n_listas = max(1, min(n, n_listas or int(np.sqrt(n))))
+        self.n_sondeos = min(n_sondeos, self.n_listas)
+        self.tamano_bloque = tamano_bloque
+        self.recall = None
+        rng = np.random.default_rng(semilla)
+
+        # k-means sobre una muestra; luego se asigna cada producto a su centroide más cercano
+        muestra = factores[rng.choice(n, min(n, self.n_listas * 64), replace=False)]
+        centroides = muestra[rng.choice(len(muestra), self.n_listas, replace=False)].copy()
+        for _ in range(iteraciones):
+            asignacion = self._asignar(muestra, centroides)
+            conteos = np.bincount(asignacion, minlength=self.n_listas)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, muestra)
+            vacios = conteos == 0
+            centroides[~vacios] = sumas[~vacios] / conteos[~vacios, np.newaxis]
+            # Las listas vacías se reinician con puntos al azar de la muestra
+            if vacios.any():
+                centroides[vacios] = muestra[rng.choice(len(muestra), vacios.sum(), replace=False)]
+        self.centroides = centroides
+
+        asignacion = self._asignar(factores, centroides)
+        self.orden = np.argsort(asignacion, kind='stable')
+        self.inicios = np.searchsorted(asignacion[self.orden], np.arange(self.n_listas + 1))
+
+    # Centroide más cercano (distancia euclidiana) de cada fila, por bloques para acotar la memoria
+    def _asignar(self, vectores, centroides):
+        normas = (centroides ** 2).sum(axis=1)
+        asignacion = np.empty(len(vectores), dtype=np.int64)
+        for inicio in range(0, len(vectores), self.tamano_bloque):
+            bloque = vectores[inicio:inicio + self.tamano_bloque]
+            asignacion[inicio:inicio + len(bloque)] = np.argmin(normas - 2 * bloque @ centroides.T, axis=1)
+        return asignacion
+
+    def buscar(self, consultas, N, excluir=None):
+        listas, _ = seleccionar_top_k(consultas @ self.centroides.T, self.n_sondeos)
+        indices = np.full((len(consultas), N), -1, dtype=np.int64)
+        puntajes = np.full((len(consultas), N), -np.inf, dtype=np.float32)
+        for i, consulta in enumerate(consultas):
+            candidatos = np.concatenate([self.orden[self.inicios[l]:self.inicios[l + 1]] for l in listas[i]])
+            if excluir is not None:
+                candidatos = candidatos[candidatos != excluir[i]]
+            if len(candidatos) == 0:
+                continue
+            mejores, valores = seleccionar_top_k((self.factores[candidatos] @ consulta)[np.newaxis, :], N)
+            indices[i, :mejores.shape[1]] = candidatos[mejores[0]]
+            puntajes[i, :mejores.shape[1]] = valores[0]
+        return indices, puntajes
+
+
+BACKENDS = {
+    'exacta': IndiceExacto,
+    'ivf': IndiceIVF
+}
+
+
+# Registrar otro motor de búsqueda; la clase recibe los factores y debe implementar buscar(consultas, N, excluir)
+def registrar_backend(nombre, clase):
+    BACKENDS[nombre] = clase
+
+
+# Proporción de los N vecinos exactos que recupera el índice, medida sobre una muestra de productos
+def medir_recall(indice, factores, N=10, muestra=500, semilla=0):
+    rng = np.random.default_rng(semilla)
+    posiciones = rng.choice(len(factores), min(muestra, len(factores)), replace=False)
+    exactos, _ = IndiceExacto(factores).buscar(factores[posiciones], N, excluir=posiciones)
+    aproximados, _ = indice.buscar(factores[posiciones], N, excluir=posiciones)
+    aciertos = [
+        len(set(fila_exacta[fila_exacta >= 0]) & set(fila_aproximada[fila_aproximada >= 0])) / max(1, (fila_exacta >= 0).sum())
+        for fila_exacta, fila_aproximada in zip(exactos, aproximados)
+    ]
+    return float(np.mean(aciertos)) if aciertos else 1.0
+
+
+# Construir el índice pedido. 'auto' elige 'exacta' o 'ivf' según el tamaño del catálogo.
+# Para 'ivf' se mide el recall y, si queda por debajo de recall_minimo, se duplican los sondeos;
+# si termina sondeando una fracción grande del catálogo se usa la búsqueda exacta
+def crear_indice(factores, busqueda='auto', recall_minimo=RECALL_MINIMO, **opciones):
+    if busqueda == 'auto':
+        busqueda = 'ivf' if len(factores) > UMBRAL_APROXIMADO else 'exacta'
+    if busqueda not in BACKENDS:
+        raise ValueError(f"Búsqueda desconocida: {busqueda}. Opciones: {sorted(BACKENDS)} o 'auto'")
+    indice = BACKENDS[busqueda](factores, **opciones)
+    if isinstance(indice, IndiceIVF):
+        indice.recall = medir_recall(indice, factores)
+        while indice.recall < recall_minimo and indice.n_sondeos < indice.n_listas:
+            indice.n_sondeos = min(indice.n_listas, indice.n_sondeos * 2)
+            indice.recall = medir_recall(indice, factores)
+        if indice.n_sondeos > FRACCION_MAXIMA_SONDEO * indice.n_listas:
+            return IndiceExacto(factores)
+    return indice
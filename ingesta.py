@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from datos import ESQUEMA_DATOS
+from catalogo import COLUMNAS_CATALOGO, construir_catalogo
+from recomendador import secciones, construir_matriz_compras
+
+# Ingesta por bloques de datos.csv para archivos que no caben en memoria.
+# Una sola pasada sobre el CSV construye, sin mantener nunca la tabla de transacciones completa:
+#   - el catálogo de productos (primera aparición de cada COD_PRODUCTO),
+#   - los totales de CANTIDAD por producto de cada sección,
+#   - la matriz dispersa facturas×productos de cada sección con sus n productos más vendidos.
+# De cada bloque solo se guardan las tripletas (factura, producto, cantidad) ya agregadas.
+
+TAMANO_BLOQUE = 1_000_000
+
+# Los bloques se leen con los textos como str: las categorías cambiarían de un bloque a otro
+_ESQUEMA_BLOQUES = {
+    columna: ('str' if tipo == 'category' else tipo)
+    for columna, tipo in ESQUEMA_DATOS.items()
+}
+
+
+def _leer_bloques(ruta_csv, tamano_bloque):
+    return pd.read_csv(
+        ruta_csv,
+        usecols=lambda columna: columna in _ESQUEMA_BLOQUES,
+        dtype=_ESQUEMA_BLOQUES,
+        chunksize=tamano_bloque
+    )
+
+
+# Recorrer datos.csv una vez y devolver un diccionario con:
+#   'catalogo': catálogo de productos indexado por COD_PRODUCTO,
+#   'totales': {sección: Serie COD_PRODUCTO -> CANTIDAD total},
+#   'matrices': {sección: (matriz, facturas, productos)} como en construir_matriz_compras,
+#   'filas': número de transacciones leídas
+def ingerir_por_bloques(ruta_csv, n_productos=200, tamano_bloque=TAMANO_BLOQUE, secciones_incluidas=None):
+    secciones_incluidas = set(secciones_incluidas or secciones.values())
+    tripletas = {seccion: [] for seccion in secciones_incluidas}
+    partes_catalogo = []
+    filas = 0
+
+    for bloque in _leer_bloques(ruta_csv, tamano_bloque):
+        filas += len(bloque)
+        partes_catalogo.append(bloque.drop_duplicates('COD_PRODUCTO')[['COD_PRODUCTO'] + COLUMNAS_CATALOGO])
+        bloque = bloque[bloque['SECCION'].isin(secciones_incluidas)]
+        agregadas = bloque.groupby(['SECCION', 'COD_FACTURA', 'COD_PRODUCTO'], sort=False)['CANTIDAD'].sum()
+        for seccion, grupo in agregadas.groupby(level='SECCION', sort=False):
+            tripletas[seccion].append((
+                grupo.index.get_level_values('COD_FACTURA').to_numpy(),
+                grupo.index.get_level_values('COD_PRODUCTO').to_numpy(),
+                grupo.to_numpy(dtype=np.float32)
+            ))
+        del bloque, agregadas
+
+    catalogo = construir_catalogo(pd.concat(partes_catalogo, ignore_index=True)) if partes_catalogo else None
+    totales, matrices = {}, {}
+    for seccion, partes in tripletas.items():
+        if not partes:
+            continue
+        compras = pd.DataFrame({
+            'COD_FACTURA': np.concatenate([parte[0] for parte in partes]),
+            'COD_PRODUCTO': np.concatenate([parte[1] for parte in partes]),
+            'CANTIDAD': np.concatenate([parte[2] for parte in partes])
+        })
+        partes.clear()
+        totales_seccion = compras.groupby('COD_PRODUCTO')['CANTIDAD'].sum()
+        if n_productos is not None:
+            totales_seccion = totales_seccion.nlargest(n_productos)
+            compras = compras[compras['COD_PRODUCTO'].isin(totales_seccion.index)]
+        totales[seccion] = totales_seccion
+        matrices[seccion] = construir_matriz_compras(compras)
+
+    return {'catalogo': catalogo, 'totales': totales, 'matrices': matrices, 'filas': filas}
@@ -0,0 +1,159 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Instrumentación liviana de las etapas del recomendador.
+#   - medir('etapa') como administrador de contexto y @medido('etapa') como decorador acumulan llamadas,
+#     tiempo total y máximo por etapa en el proceso;
+#   - solicitud('nombre') agrupa las etapas de una ejecución de página y guarda su desglose, con la memoria
+#     residente al terminar, en un historial de las últimas solicitudes;
+#   - exportar_prometheus() devuelve los acumulados en formato de texto de Prometheus y, si se define
+#     INSTRUMENTACION_LOG, cada solicitud se agrega como una línea JSON a ese archivo.
+#
+# Variables de entorno:
+#   INSTRUMENTACION=0         desactivar la medición
+#   INSTRUMENTACION_HISTORIAL solicitudes guardadas en el historial (por defecto 50)
+#   INSTRUMENTACION_LOG       archivo JSON Lines con el desglose de cada solicitud
+
+ACTIVA = os.environ.get('INSTRUMENTACION', '1') != '0'
+MAX_HISTORIAL = int(os.environ.get('INSTRUMENTACION_HISTORIAL', 50))
+ARCHIVO_LOG = os.environ.get('INSTRUMENTACION_LOG')
+
+_lock = threading.Lock()
+_etapas = {}
+_historial = collections.deque(maxlen=MAX_HISTORIAL)
+_solicitud_actual = contextvars.ContextVar('solicitud_actual', default=None)
+
+
+# Memoria residente actual del proceso en bytes (en Linux desde /proc; en otros sistemas, el máximo de getrusage)
+def memoria_residente():
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def _acumular(etapa, segundos):
+    with _lock:
+        acumulado = _etapas.get(etapa)
+        if acumulado is None:
+            acumulado = _etapas[etapa] = {'llamadas': 0, 'segundos': 0.0, 'maximo': 0.0}
+        acumulado['llamadas'] += 1
+        acumulado['segundos'] += segundos
+        acumulado['maximo'] = max(acumulado['maximo'], segundos)
+
+
+@contextlib.contextmanager
+def medir(etapa):
+    if not ACTIVA:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        _acumular(etapa, segundos)
+        actual = _solicitud_actual.get()
+        if actual is not None:
+            actual['etapas'].append({'etapa': etapa, 'segundos': segundos})
+
+
+def medido(etapa=None):
+    def decorador(funcion):
+        nombre = etapa or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def _escribir_log(registro):
+    try:
+        with _lock, open(ARCHIVO_LOG, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    except OSError:
+        pass
+
+
+# Agrupar las etapas medidas durante una ejecución de página (o cualquier unidad de trabajo)
+@contextlib.contextmanager
+def solicitud(nombre, **atributos):
+    if not ACTIVA:
+        yield None
+        return
+    actual = {'nombre': nombre, 'inicio': time.time(), 'etapas': [], **atributos}
+    token = _solicitud_actual.set(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        _solicitud_actual.reset(token)
+        actual['segundos'] = time.perf_counter() - inicio
+        actual['memoria_mb'] = memoria_residente() / (1024 * 1024)
+        with _lock:
+            _historial.append(actual)
+        if ARCHIVO_LOG:
+            _escribir_log(actual)
+
+
+# Últimas solicitudes, de la más reciente a la más antigua
+def ultimas_solicitudes(n=None):
+    with _lock:
+        solicitudes = list(_historial)[::-1]
+    return solicitudes[:n] if n else solicitudes
+
+
+# Acumulados por etapa: {etapa: {'llamadas', 'segundos', 'maximo'}}
+def resumen_etapas():
+    with _lock:
+        return {etapa: dict(acumulado) for etapa, acumulado in _etapas.items()}
+
+
+def reiniciar():
+    with _lock:
+        _etapas.clear()
+        _historial.clear()
+
+
+def exportar_prometheus(prefijo='recomendador'):
+    lineas = []
+    metricas = [
+        ('etapa_llamadas_total', 'counter', 'Llamadas por etapa', 'llamadas'),
+        ('etapa_segundos_total', 'counter', 'Tiempo acumulado por etapa', 'segundos'),
+        ('etapa_segundos_max', 'gauge', 'Tiempo máximo de una llamada por etapa', 'maximo')
+    ]
+    etapas = resumen_etapas()
+    for nombre, tipo, ayuda, campo in metricas:
+        lineas.append(f'# HELP {prefijo}_{nombre} {ayuda}')
+        lineas.append(f'# TYPE {prefijo}_{nombre} {tipo}')
+        for etapa, acumulado in sorted(etapas.items()):
+            lineas.append(f'{prefijo}_{nombre}{{etapa="{etapa}"}} {acumulado[campo]}')
+    lineas.append(f'# HELP {prefijo}_memoria_residente_bytes Memoria residente del proceso')
+    lineas.append(f'# TYPE {prefijo}_memoria_residente_bytes gauge')
+    lineas.append(f'{prefijo}_memoria_residente_bytes {memoria_residente()}')
+    return '\n'.join(lineas) + '\n'
+
+
+# Escribir la exportación de Prometheus de forma atómica (p. ej. para el textfile collector de node_exporter)
+def escribir_prometheus(ruta, prefijo='recomendador'):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(exportar_prometheus(prefijo))
+    os.replace(temporal, ruta)
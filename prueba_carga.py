@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+# Prueba de carga local de la API (api.py): varios clientes concurrentes con conexiones persistentes piden
+# combos de productos al azar de una sección y se informan el rendimiento y la latencia por percentiles.
+#
+# Uso: python prueba_carga.py --seccion 24 --clientes 32 --solicitudes 2000 [--salida carga.json]
+
+
+async def _pedir(lector, escritor, ruta, host):
+    escritor.write(f'GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+    await escritor.drain()
+    estado = int((await lector.readline()).split()[1])
+    largo = 0
+    while True:
+        linea = await lector.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        clave, _, valor = linea.decode('latin-1').partition(':')
+        if clave.strip().lower() == 'content-length':
+            largo = int(valor)
+    return estado, await lector.readexactly(largo)
+
+
+async def obtener_productos(host, puerto, seccion):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        estado, cuerpo = await _pedir(lector, escritor, f'/productos?section={seccion}', host)
+    finally:
+        escritor.close()
+    if estado != 200:
+        raise RuntimeError(f"/productos respondió {estado}: {cuerpo.decode('utf-8', 'replace')}")
+    return json.loads(cuerpo)['products']
+
+
+async def _cliente(host, puerto, rutas, latencias, estados):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            estado, _ = await _pedir(lector, escritor, ruta, host)
+            latencias.append(time.perf_counter() - inicio)
+            estados[estado] = estados.get(estado, 0) + 1
+    finally:
+        escritor.close()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def probar(host, puerto, seccion, clientes=32, solicitudes=2000, productos_por_solicitud=4, n=5, semilla=0):
+    productos = await obtener_productos(host, puerto, seccion)
+    if not productos:
+        raise RuntimeError(f"La sección {seccion} no tiene productos en el modelo")
+    rng = random.Random(semilla)
+    rutas = [
+        f"/combos?section={seccion}&n={n}&products="
+        + ','.join(map(str, rng.sample(productos, min(productos_por_solicitud, len(productos)))))
+        for _ in range(solicitudes)
+    ]
+    latencias, estados = [], {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente(host, puerto, rutas[i::clientes], latencias, estados) for i in range(clientes)
+    ])
+    segundos = time.perf_counter() - inicio
+    return {
+        'seccion': seccion,
+        'clientes': clientes,
+        'solicitudes': len(latencias),
+        'segundos': segundos,
+        'solicitudes_por_segundo': len(latencias) / segundos,
+        'latencia_media_ms': statistics.mean(latencias) * 1000,
+        'latencia_p50_ms': percentil(latencias, 50) * 1000,
+        'latencia_p95_ms': percentil(latencias, 95) * 1000,
+        'latencia_p99_ms': percentil(latencias, 99) * 1000,
+        'estados': {str(estado): cantidad for estado, cantidad in sorted(estados.items())}
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de combos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--seccion', type=int, default=24)
+    parser.add_argument('--clientes', type=int, default=32, help="Conexiones concurrentes")
+    parser.add_argument('--solicitudes', type=int, default=2000, help="Solicitudes en total")
+    parser.add_argument('--productos', type=int, default=4, help="Productos por solicitud")
+    parser.add_argument('--n', type=int, default=5, help="Complementos por producto")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(probar(args.host, args.puerto, args.seccion, args.clientes, args.solicitudes, args.productos,
+                                   args.n, args.semilla))
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
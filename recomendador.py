@@ -0,0 +1,184 @@
+import os
+import numpy as np
+import pandas as pd
+from registro_modelos import registro, clave_modelo
+from entrenamiento_fondo import entrenamientos
+from artefactos import cargar_artefactos
+from similitud import motor_similitud
+from instrumentacion import medido
+
+# Lógica de recomendación compartida por las aplicaciones de Streamlit y los procesos por lotes.
+# scipy e implicit se importan dentro de las funciones que los usan, para que importar
+# el módulo (p. ej. en la pantalla de inicio de sesión) no cargue dependencias que solo necesita el modelo
+
+# Diccionario para mapear categorías con sus valores de sección
+secciones = {
+    'Limpieza del Hogar': 14,
+    'Cuidado Personal': 16,
+    'Bebidas': 24,
+    'Alimentos': 25
+}
+
+# Hiperparámetros del modelo ALS
+HIPERPARAMETROS_ALS = {
+    'factors': 50,
+    'regularization': 0.1,
+    'iterations': 30
+}
+
+# Productos más vendidos por sección con que las aplicaciones entrenan sus modelos; los artefactos
+# entrenados con otro corte no se usan en las aplicaciones
+TOP_PRODUCTOS = 200
+
+# Búsqueda de complementos: 'exacta', 'ivf' (aproximada) o 'auto' (según el tamaño del catálogo)
+BUSQUEDA_COMPLEMENTOS = os.environ.get('BUSQUEDA_COMPLEMENTOS', 'auto')
+
+# Función para filtrar productos por categoría seleccionada
+@medido()
+def filtrar_por_categoria(df, categoria_seleccionada):
+    seccion = secciones.get(categoria_seleccionada)
+    return df[df['SECCION'] == seccion]
+
+# Obtener el top 200 productos más vendidos de la categoría seleccionada (n=None conserva todos los productos)
+@medido()
+def obtener_top_200_productos(df_categoria, n=200):
+    if df_categoria.empty:
+        return pd.DataFrame()
+    elif n is None:
+        return df_categoria
+    else:
+        top_200_productos = df_categoria.groupby('COD_PRODUCTO')['CANTIDAD'].sum().nlargest(n).index
+        return df_categoria[df_categoria['COD_PRODUCTO'].isin(top_200_productos)]
+
+# Construir la matriz facturas×productos directamente en formato disperso, sin pasar por una tabla densa.
+# Facturas y productos quedan ordenados por código, igual que con groupby(...).unstack().
+# Devuelve (matriz, facturas, productos), donde productos[i] es el COD_PRODUCTO de la columna i
+@medido()
+def construir_matriz_compras(df):
+    from scipy.sparse import coo_matrix
+
+    filas, facturas = pd.factorize(df['COD_FACTURA'], sort=True)
+    columnas, productos = pd.factorize(df['COD_PRODUCTO'], sort=True)
+    cantidades = df['CANTIDAD'].fillna(0).to_numpy(dtype=np.float32)
+    validas = (filas >= 0) & (columnas >= 0)
+    if not validas.all():
+        filas, columnas, cantidades = filas[validas], columnas[validas], cantidades[validas]
+    # Al pasar a CSR se suman las filas repetidas de una misma factura y producto
+    matriz = coo_matrix((cantidades, (filas, columnas)), shape=(len(facturas), len(productos))).tocsr()
+    matriz.eliminate_zeros()
+    return matriz, facturas.rename('COD_FACTURA'), productos.rename('COD_PRODUCTO')
+
+# Quedarse con una proporción de las facturas (filas de la matriz), elegidas al azar con la semilla dada.
+# Cada factura entra o queda fuera completa; las columnas (productos) no cambian.
+# Devuelve (matriz, facturas) con solo las filas elegidas
+@medido()
+def muestrear_facturas(matriz, facturas, proporcion=1.0, semilla=42):
+    if proporcion >= 1:
+        return matriz, facturas
+    elegidas = np.random.default_rng(semilla).random(matriz.shape[0]) < proporcion
+    return matriz[elegidas], facturas[elegidas]
+
+# Preparar datos para entrenar el modelo ALS (None si no hay datos suficientes).
+# Por defecto se usan todas las facturas; con proporcion < 1 se entrena con una muestra de facturas
+@medido()
+def preparar_datos_para_entrenar(df, proporcion=1.0, semilla=42):
+    if len(df) > 0:
+        matriz, facturas, productos = construir_matriz_compras(df)
+        matriz, facturas = muestrear_facturas(matriz, facturas, proporcion, semilla)
+        return matriz, facturas, productos
+    else:
+        return None
+
+# Entrenar el modelo ALS sobre la matriz dispersa facturas×productos (num_threads=0 usa todos los núcleos).
+# callback(iteracion, segundos, perdida) se llama al final de cada iteración
+@medido()
+def entrenar_modelo_als(df_train_sparse, hiperparametros=HIPERPARAMETROS_ALS, num_threads=0, callback=None):
+    from implicit.als import AlternatingLeastSquares
+
+    if df_train_sparse is not None:
+        als_model = AlternatingLeastSquares(**hiperparametros, num_threads=num_threads)
+        als_model.fit(df_train_sparse, show_progress=callback is None, callback=callback)
+        return als_model
+    else:
+        return None
+
+# Entrenar el modelo de una sección completa con sus n_productos más vendidos (None para toda la sección).
+# Devuelve (productos, modelo_als, matriz), donde productos[i] es el COD_PRODUCTO de la columna i de la matriz
+def entrenar_seccion(df_seccion, hiperparametros=HIPERPARAMETROS_ALS, n_productos=TOP_PRODUCTOS, callback=None):
+    df_top = obtener_top_200_productos(df_seccion, n_productos)
+    compras = preparar_datos_para_entrenar(df_top)
+    if compras is None:
+        return None
+    df_train_sparse, _, productos = compras
+    als_model = entrenar_modelo_als(df_train_sparse, hiperparametros, callback=callback)
+    return productos, als_model, df_train_sparse
+
+# Recomendar complementos para varios productos a la vez con el motor de similitud entre productos.
+# Devuelve ({COD_PRODUCTO: [COD_PRODUCTO recomendados]}, [códigos que no están en el modelo])
+@medido()
+def recomendar_lote(productos, als_model, productos_ids, N=5, metrica='coseno', busqueda=BUSQUEDA_COMPLEMENTOS):
+    complementos, faltantes = motor_similitud(productos, als_model, metrica, busqueda).complementos(productos_ids, N)
+    recomendaciones = {
+        producto_id: [codigo for codigo, _ in lista]
+        for producto_id, lista in complementos.items()
+    }
+    return recomendaciones, faltantes
+
+# Complementos de los productos en las posiciones [inicio, fin) del modelo.
+# Devuelve un DataFrame largo con COD_PRODUCTO_A, COD_PRODUCTO_B, posicion (1 = mejor) y puntaje
+def recomendar_bloque(productos, als_model, inicio, fin, N=5, metrica='coseno', busqueda=BUSQUEDA_COMPLEMENTOS):
+    motor = motor_similitud(productos, als_model, metrica, busqueda)
+    codigos = motor.codigos
+    posiciones = np.arange(inicio, min(fin, len(codigos)))
+    if len(posiciones) == 0:
+        return pd.DataFrame(columns=['COD_PRODUCTO_A', 'COD_PRODUCTO_B', 'posicion', 'puntaje'])
+    indices, puntajes = motor.puntuar(posiciones, N)
+    validos = indices.ravel() >= 0
+    return pd.DataFrame({
+        'COD_PRODUCTO_A': np.repeat(codigos[posiciones], indices.shape[1])[validos],
+        'COD_PRODUCTO_B': codigos[indices.ravel()[validos]],
+        'posicion': np.tile(np.arange(1, indices.shape[1] + 1), len(posiciones))[validos],
+        'puntaje': puntajes.ravel()[validos]
+    })
+
+# Precalcular los N complementos de todos los productos de la sección, por bloques para acotar la memoria
+def recomendar_seccion_completa(productos, als_model, N=5, tamano_bloque=2048, metrica='coseno', busqueda=BUSQUEDA_COMPLEMENTOS):
+    bloques = [
+        recomendar_bloque(productos, als_model, inicio, inicio + tamano_bloque, N, metrica, busqueda)
+        for inicio in range(0, len(productos), tamano_bloque)
+    ]
+    if not bloques:
+        return pd.DataFrame(columns=['COD_PRODUCTO_A', 'COD_PRODUCTO_B', 'posicion', 'puntaje'])
+    return pd.concat(bloques, ignore_index=True)
+
+# Obtener el modelo de la sección: primero del registro en memoria, luego de los artefactos
+# entrenados fuera de línea y, solo si no hay ninguno vigente, entrenándolo con df_seccion
+@medido()
+def obtener_modelo_seccion(seccion, df_seccion, huella, hiperparametros=HIPERPARAMETROS_ALS):
+    def entrenar():
+        modelo = cargar_artefactos(seccion, huella, hiperparametros, top_productos=TOP_PRODUCTOS)
+        if modelo is None:
+            modelo = entrenar_seccion(df_seccion, hiperparametros)
+        return modelo
+    return registro.obtener_o_entrenar(clave_modelo(seccion, huella, hiperparametros), entrenar)
+
+# Igual que obtener_modelo_seccion pero sin bloquear: devuelve el TrabajoEntrenamiento de la sección,
+# que informa el progreso por iteración y queda terminado con el modelo (o None) en trabajo.resultado
+def solicitar_modelo_seccion(seccion, df_seccion, huella, hiperparametros=HIPERPARAMETROS_ALS):
+    def entrenar(trabajo):
+        modelo = cargar_artefactos(seccion, huella, hiperparametros, top_productos=TOP_PRODUCTOS)
+        if modelo is None:
+            modelo = entrenar_seccion(df_seccion, hiperparametros, callback=trabajo.informar)
+        return modelo
+    clave = clave_modelo(seccion, huella, hiperparametros)
+    return entrenamientos.solicitar(clave, entrenar, hiperparametros.get('iterations'))
+
+# Cargar en el registro los artefactos vigentes de todas las secciones
+def precargar_modelos(huella, hiperparametros=HIPERPARAMETROS_ALS):
+    cargados = []
+    for seccion in secciones.values():
+        modelo = cargar_artefactos(seccion, huella, hiperparametros, top_productos=TOP_PRODUCTOS)
+        if modelo is not None:
+            registro.guardar(clave_modelo(seccion, huella, hiperparametros), modelo)
+            cargados.append(seccion)
+    return cargados
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Registro de modelos ALS compartido por todas las sesiones del proceso.
+# Los modelos se guardan por (sección, huella de los datos, hiperparámetros) y se
+# descartan en orden LRU cuando se supera el número máximo de modelos o el tope de memoria.
+
+MAX_MODELOS = int(os.environ.get('REGISTRO_MAX_MODELOS', 8))
+MAX_MEGABYTES = int(os.environ.get('REGISTRO_MAX_MB', 1024))
+
+# Huellas ya calculadas por (ruta, tamaño, fecha de modificación)
+_huellas_archivos = {}
+_lock_huellas = threading.Lock()
+
+
+# Calcular la huella del contenido de un archivo; solo se vuelve a leer si cambia su tamaño o fecha
+def huella_archivo(ruta, tamano_bloque=1024 * 1024):
+    estado = os.stat(ruta)
+    firma = (os.path.abspath(ruta), estado.st_size, estado.st_mtime_ns)
+    with _lock_huellas:
+        if firma in _huellas_archivos:
+            return _huellas_archivos[firma]
+    resumen = hashlib.sha1()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b''):
+            resumen.update(bloque)
+    huella = resumen.hexdigest()[:16]
+    with _lock_huellas:
+        _huellas_archivos[firma] = huella
+    return huella
+
+
+# Construir la clave del registro a partir de la sección, la huella de los datos y los hiperparámetros
+def clave_modelo(seccion, huella, hiperparametros):
+    return (seccion, huella, tuple(sorted(hiperparametros.items())))
+
+
+# Estimar la memoria ocupada por un modelo entrenado (arreglos, matrices dispersas, DataFrames y modelos ALS)
+def estimar_tamano(valor):
+    if valor is None:
+        return 0
+    if isinstance(valor, (tuple, list)):
+        return sum(estimar_tamano(v) for v in valor)
+    if isinstance(valor, dict):
+        return sum(estimar_tamano(v) for v in valor.values())
+    if hasattr(valor, 'item_factors'):
+        return estimar_tamano(getattr(valor, 'user_factors', None)) + estimar_tamano(valor.item_factors)
+    if hasattr(valor, 'indptr'):
+        return int(valor.data.nbytes + valor.indices.nbytes + valor.indptr.nbytes)
+    if hasattr(valor, 'memory_usage') and hasattr(valor, 'columns'):
+        return int(valor.memory_usage(index=True).sum())
+    if hasattr(valor, 'nbytes'):
+        return int(valor.nbytes)
+    return 0
+
+
+class RegistroModelos:
+
+    def __init__(self, max_modelos=MAX_MODELOS, max_bytes=MAX_MEGABYTES * 1024 * 1024):
+        self.max_modelos = max_modelos
+        self.max_bytes = max_bytes
+        self._modelos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._locks_claves = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._modelos)
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._modelos
+
+    @property
+    def bytes_ocupados(self):
+        with self._lock:
+            return self._bytes
+
+    # Devolver el modelo guardado para la clave (o None) y marcarlo como el más reciente
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._modelos:
+                return None
+            self._modelos.move_to_end(clave)
+            return self._modelos[clave][0]
+
+    # Guardar un modelo y descartar los menos usados si se superan los límites.
+    # El modelo recién guardado nunca se descarta, aunque por sí solo supere el tope de memoria.
+    def guardar(self, clave, valor):
+        tamano = estimar_tamano(valor)
+        with self._lock:
+            if clave in self._modelos:
+                self._bytes -= self._modelos.pop(clave)[1]
+            self._modelos[clave] = (valor, tamano)
+            self._bytes += tamano
+            while len(self._modelos) > 1 and (len(self._modelos) > self.max_modelos or self._bytes > self.max_bytes):
+                _, (_, tamano_descartado) = self._modelos.popitem(last=False)
+                self._bytes -= tamano_descartado
+
+    # Devolver el modelo de la clave, entrenándolo una sola vez aunque lo pidan varias sesiones a la vez
+    def obtener_o_entrenar(self, clave, entrenar):
+        valor = self.obtener(clave)
+        if valor is not None:
+            return valor
+        with self._lock:
+            lock_clave = self._locks_claves.setdefault(clave, threading.Lock())
+        try:
+            with lock_clave:
+                valor = self.obtener(clave)
+                if valor is None:
+                    valor = entrenar()
+                    if valor is not None:
+                        self.guardar(clave, valor)
+        finally:
+            with self._lock:
+                if self._locks_claves.get(clave) is lock_clave:
+                    del self._locks_claves[clave]
+        return valor
+
+    # Descartar los modelos de una sección (o todos si no se indica)
+    def limpiar(self, seccion=None):
+        with self._lock:
+            for clave in [c for c in self._modelos if seccion is None or c[0] == seccion]:
+                self._bytes -= self._modelos.pop(clave)[1]
+
+
+# Registro único del proceso: el módulo se importa una sola vez y todas las sesiones lo comparten
+registro = RegistroModelos()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from recomendador import secciones, HIPERPARAMETROS_ALS, filtrar_por_categoria, obtener_top_200_productos, preparar_datos_para_entrenar, entrenar_modelo_als, recomendar_lote
+from datos import cargar_transacciones, ruta_cache
+from catalogo import construir_catalogo
+from combos import pares_recomendados, calcular_combos
+
+# Medición reproducible del camino principal: carga de datos, filtrado por sección, top de productos,
+# matriz de entrenamiento, ajuste ALS, recomendaciones y cálculo de combos.
+# Las transacciones son sintéticas, con el mismo esquema que datos.csv y una semilla fija, de modo que
+# los resultados en JSON se pueden comparar entre commits (--comparar resultados_anteriores.json).
+# Con --arranque se mide además el arranque en frío de las aplicaciones: cada repetición corre en un proceso
+# nuevo que importa Streamlit y dibuja la primera página (el inicio de sesión en app2.py y app10.py), y se
+# informa qué dependencias pesadas quedaron importadas.
+#
+# Uso: python rendimiento.py --filas 10000 1000000 10000000 [--salida rendimiento.json]
+#      python rendimiento.py --arranque app2.py app10.py
+
+TAMANOS = [10_000, 1_000_000, 10_000_000]
+
+# Dependencias que la primera página de las aplicaciones no debería importar
+MODULOS_PESADOS = ['implicit', 'scipy', 'matplotlib', 'gdown']
+
+# Programa que corre en un proceso nuevo para medir el arranque en frío de un script de Streamlit
+CODIGO_ARRANQUE = '''
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_s = time.perf_counter() - inicio
+prueba = AppTest.from_file(sys.argv[1], default_timeout=600).run()
+print(json.dumps({
+    'importar_streamlit_s': streamlit_s,
+    'primera_pagina_s': time.perf_counter() - inicio - streamlit_s,
+    'errores': [str(error.value) for error in prueba.exception],
+    'modulos_pesados': [modulo for modulo in sys.argv[2:] if modulo in sys.modules]
+}))
+'''
+
+
+# Generar n_filas transacciones con el esquema de datos.csv.
+# La popularidad de los productos sigue una ley de potencias y cada factura tiene en promedio lineas_por_factura líneas
+def generar_transacciones(n_filas, productos_por_seccion=2000, lineas_por_factura=5, semilla=0):
+    rng = np.random.default_rng(semilla)
+    codigos_seccion = np.array(list(secciones.values()), dtype=np.int32)
+    seccion = rng.choice(codigos_seccion, n_filas)
+    rango = (rng.zipf(1.2, n_filas) - 1) % productos_por_seccion
+    producto = (seccion * 100_000 + rango).astype(np.int32)
+    # Precio y costo fijos por producto, derivados de su código
+    base = (producto % 997 + 1).astype(np.float32)
+    return pd.DataFrame({
+        'COD_FACTURA': np.sort(rng.integers(0, max(1, n_filas // lineas_por_factura), n_filas)),
+        'COD_PRODUCTO': producto,
+        'CANTIDAD': rng.integers(1, 6, n_filas).astype(np.float32),
+        'SECCION': seccion,
+        'DESC_CLASE': pd.Categorical.from_codes(rango % 20, [f'CLASE {i}' for i in range(20)]),
+        'DESC_PRODUCTO': pd.Series(producto).map('PRODUCTO {}'.format).astype('category'),
+        'VALOR_PVSI': base * 0.5,
+        'COSTO': base * 0.3
+    })
+
+
+def _medir(funcion, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, {
+        'min_s': min(tiempos),
+        'mediana_s': statistics.median(tiempos),
+        'repeticiones': repeticiones
+    }
+
+
+# Medir cada etapa sobre n_filas transacciones sintéticas. Devuelve {etapa: tiempos}
+def medir_etapas(n_filas, repeticiones=3, categoria='Bebidas', n_seleccionados=4, directorio=None, semilla=0):
+    etapas = {}
+    with tempfile.TemporaryDirectory(dir=directorio) as temporal:
+        ruta_csv = os.path.join(temporal, 'datos.csv')
+        generar_transacciones(n_filas, semilla=semilla).to_csv(ruta_csv, index=False)
+
+        df, etapas['cargar_datos_csv'] = _medir(lambda: cargar_transacciones(ruta_csv, usar_cache=False), repeticiones)
+        cargar_transacciones(ruta_csv)
+        if os.path.exists(ruta_cache(ruta_csv)):
+            df, etapas['cargar_datos_cache'] = _medir(lambda: cargar_transacciones(ruta_csv), repeticiones)
+
+    df_categoria, etapas['filtrar_por_categoria'] = _medir(lambda: filtrar_por_categoria(df, categoria), repeticiones)
+    df_top, etapas['obtener_top_200_productos'] = _medir(lambda: obtener_top_200_productos(df_categoria), repeticiones)
+    compras, etapas['preparar_datos_para_entrenar'] = _medir(lambda: preparar_datos_para_entrenar(df_top), repeticiones)
+    matriz, _, productos = compras
+    # Con un callback vacío fit no dibuja la barra de progreso
+    als_model, etapas['entrenar_modelo_als'] = _medir(
+        lambda: entrenar_modelo_als(matriz, dict(HIPERPARAMETROS_ALS, random_state=semilla), callback=lambda *_: None),
+        repeticiones)
+
+    # Los productos más vendidos como selección, igual que los elegiría un usuario en la página 1
+    seleccionados = list(productos[:n_seleccionados])
+    (recomendaciones, _), etapas['generar_recomendaciones_seleccionados'] = _medir(
+        lambda: recomendar_lote(productos, als_model, seleccionados, N=5), repeticiones)
+    catalogo, etapas['construir_catalogo'] = _medir(lambda: construir_catalogo(df), repeticiones)
+
+    def combos():
+        codigos_a, codigos_b = pares_recomendados(seleccionados, recomendaciones)
+        return calcular_combos(catalogo, codigos_a, codigos_b)
+
+    _, etapas['calcular_combos'] = _medir(combos, repeticiones)
+    for etapa in etapas.values():
+        etapa['filas'] = n_filas
+    return etapas
+
+
+# Medir el arranque en frío de un script de Streamlit en repeticiones procesos nuevos.
+# Devuelve los tiempos de la primera página (sin contar la importación de Streamlit) y los módulos pesados importados
+def medir_arranque(script, repeticiones=3):
+    script = os.path.abspath(script)
+    tiempos, importar_streamlit, medicion = [], [], None
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', CODIGO_ARRANQUE, script, *MODULOS_PESADOS],
+                                capture_output=True, text=True, check=True).stdout
+        medicion = json.loads(salida.strip().splitlines()[-1])
+        if medicion['errores']:
+            raise RuntimeError(f"{script} falló al arrancar: {medicion['errores']}")
+        tiempos.append(medicion['primera_pagina_s'])
+        importar_streamlit.append(medicion['importar_streamlit_s'])
+    return {
+        'min_s': min(tiempos),
+        'mediana_s': statistics.median(tiempos),
+        'repeticiones': repeticiones,
+        'importar_streamlit_s': statistics.median(importar_streamlit),
+        'modulos_pesados': medicion['modulos_pesados']
+    }
+
+
+def entorno():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count()
+    }
+
+
+# Comparar con resultados anteriores: cociente entre la mediana actual y la anterior de cada etapa
+def comparar(resultados, anteriores):
+    previos = {(r['filas'], r['etapa']): r for r in anteriores['resultados']}
+    filas = []
+    for resultado in resultados['resultados']:
+        previo = previos.get((resultado['filas'], resultado['etapa']))
+        if previo is not None:
+            filas.append({
+                'filas': resultado['filas'],
+                'etapa': resultado['etapa'],
+                'anterior_s': previo['mediana_s'],
+                'actual_s': resultado['mediana_s'],
+                'cociente': resultado['mediana_s'] / previo['mediana_s'] if previo['mediana_s'] else float('nan')
+            })
+    return pd.DataFrame(filas)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mide el tiempo de cada etapa del recomendador con datos sintéticos.")
+    parser.add_argument('--filas', type=int, nargs='+', help="Tamaños de datos a medir (por defecto los de TAMANOS, o ninguno con --arranque)")
+    parser.add_argument('--arranque', nargs='+', default=[], help="Scripts de Streamlit cuyo arranque en frío se mide")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--temporal', help="Directorio para los CSV sintéticos (por defecto el del sistema)")
+    parser.add_argument('--salida', help="Archivo JSON con los resultados")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    resultados = {'entorno': entorno(), 'resultados': []}
+    for script in args.arranque:
+        tiempos = medir_arranque(script, args.repeticiones)
+        resultados['resultados'].append(dict(tiempos, etapa=f'arranque_{os.path.basename(script)}', filas=0))
+        print(f"{os.path.basename(script):<20} primera página {tiempos['mediana_s'] * 1000:>10.2f} ms"
+              f"  (Streamlit {tiempos['importar_streamlit_s'] * 1000:.0f} ms)"
+              f"  módulos pesados: {', '.join(tiempos['modulos_pesados']) or 'ninguno'}")
+    filas = args.filas if args.filas is not None else ([] if args.arranque else TAMANOS)
+    for n_filas in filas:
+        for etapa, tiempos in medir_etapas(n_filas, args.repeticiones, directorio=args.temporal, semilla=args.semilla).items():
+            resultados['resultados'].append(dict(tiempos, etapa=etapa))
+            print(f"{n_filas:>12,} filas  {etapa:<40} {tiempos['mediana_s'] * 1000:>12.2f} ms")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            print(comparar(resultados, json.load(archivo)).to_string(float_format='{:.3f}'.format))
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from registro_modelos import huella_archivo, registro, clave_modelo
+from fuentes_datos import obtener_archivo
+from datos import cargar_transacciones, cargar_ventas
+from catalogo import construir_catalogo
+from combos import pares_recomendados, calcular_combos
+from ventas import agregar_ventas_por_producto, resumir_combos
+from recomendador import secciones, HIPERPARAMETROS_ALS, obtener_modelo_seccion, precargar_modelos, recomendar_lote
+from instrumentacion import medido
+
+# Núcleo del recomendador de combos sin interfaz: el mismo flujo de las páginas 2 y 3 de las aplicaciones
+# (modelo de la sección → complementos → precio y margen del combo → estimación de ventas mensuales),
+# para usarlo desde la API HTTP, procesos por lotes o pruebas. Los datos se cargan una vez al crear el servicio.
+
+COLUMNAS_COMBO = [
+    'COD_PRODUCTO_A', 'COD_PRODUCTO_B', 'Producto A', 'Producto B', 'precio_combo', 'costo_combo', 'margen_combo',
+    'cantidad_estimada', 'venta_estimada', 'ganancia_estimada', 'con_datos'
+]
+
+
+class ServicioCombos:
+
+    def __init__(self, ruta_datos=None, ruta_ventas=None, hiperparametros=HIPERPARAMETROS_ALS, N=5):
+        ruta_datos = ruta_datos or obtener_archivo('datos.csv')
+        ruta_ventas = ruta_ventas or obtener_archivo('ventas_mensuales.csv')
+        self.hiperparametros = hiperparametros
+        self.N = N
+        self.huella = huella_archivo(ruta_datos)
+        self.df = cargar_transacciones(ruta_datos, mapear=True)
+        self.catalogo = construir_catalogo(self.df)
+        self.agregados_ventas = agregar_ventas_por_producto(cargar_ventas(ruta_ventas, mapear=True))
+        self.secciones_cargadas = precargar_modelos(self.huella, hiperparametros)
+
+    # Modelo (productos, modelo_als, matriz) de la sección; se entrena solo si no está en el registro ni en artefactos
+    def modelo(self, seccion):
+        modelo = registro.obtener(clave_modelo(seccion, self.huella, self.hiperparametros))
+        if modelo is None:
+            modelo = obtener_modelo_seccion(seccion, self.df[self.df['SECCION'] == seccion], self.huella, self.hiperparametros)
+        return modelo
+
+    # Códigos de producto del modelo de la sección (vacío si no hay datos suficientes)
+    def productos(self, seccion):
+        modelo = self.modelo(seccion)
+        return [] if modelo is None else modelo[0].tolist()
+
+    # Combos de varias consultas [(seccion, [COD_PRODUCTO])] agrupadas por sección: un solo cálculo de complementos,
+    # precios y estimaciones por sección. Devuelve, en el mismo orden, {'combos': DataFrame, 'faltantes': [...]}
+    @medido('servicio_combos')
+    def combos_lote(self, consultas, N=None):
+        N = N or self.N
+        resultados = [None] * len(consultas)
+        por_seccion = {}
+        for posicion, (seccion, productos_ids) in enumerate(consultas):
+            if seccion not in secciones.values():
+                raise ValueError(f"Sección desconocida: {seccion}")
+            por_seccion.setdefault(seccion, []).append(posicion)
+
+        for seccion, posiciones in por_seccion.items():
+            modelo = self.modelo(seccion)
+            ids = list(dict.fromkeys(producto for posicion in posiciones for producto in consultas[posicion][1]))
+            recomendaciones, faltantes = ({}, ids) if modelo is None else recomendar_lote(modelo[0], modelo[1], ids, N)
+            codigos_a, codigos_b = pares_recomendados(ids, recomendaciones)
+            combos = calcular_combos(self.catalogo, codigos_a, codigos_b)
+            resumen = resumir_combos(combos, self.agregados_ventas)
+            combos = pd.concat([combos, resumen.drop(columns='Combo')], axis=1)[COLUMNAS_COMBO]
+            faltantes = set(faltantes)
+            for posicion in posiciones:
+                productos_ids = consultas[posicion][1]
+                resultados[posicion] = {
+                    'combos': combos[combos['COD_PRODUCTO_A'].isin(productos_ids)].reset_index(drop=True),
+                    'faltantes': [producto for producto in productos_ids if producto in faltantes]
+                }
+        return resultados
+
+    def combos(self, seccion, productos_ids, N=None):
+        return self.combos_lote([(seccion, productos_ids)], N)[0]
+
+
+# Pasar un DataFrame de combos a registros JSON (NaN como null y tipos de numpy como tipos de Python)
+def combos_a_registros(combos):
+    registros = combos.astype(object).where(combos.notna(), None).to_dict('records')
+    return [
+        {clave: valor.item() if isinstance(valor, np.generic) else valor for clave, valor in registro_combo.items()}
+        for registro_combo in registros
+    ]
@@ -0,0 +1,64 @@
+import threading
+import weakref
+import numpy as np
+from indice_ann import crear_indice
+
+# Motor de complementos producto a producto sobre als_model.item_factors.
+# "Productos comprados con X" se obtiene comparando el factor de X con el de los demás productos
+# (coseno o producto punto), con los factores normalizados calculados una sola vez por modelo.
+# La búsqueda puede ser exacta o aproximada (ver indice_ann.py).
+
+METRICAS = ('coseno', 'producto')
+
+# Motores ya construidos por modelo; se liberan junto con el modelo
+_motores = weakref.WeakKeyDictionary()
+_lock_motores = threading.Lock()
+
+
+class MotorSimilitud:
+
+    def __init__(self, productos, factores, metrica='coseno', busqueda='auto'):
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica}. Opciones: {METRICAS}")
+        factores = np.asarray(factores, dtype=np.float32)
+        if metrica == 'coseno':
+            normas = np.linalg.norm(factores, axis=1)
+            normas[normas == 0] = 1.0
+            factores = factores / normas[:, np.newaxis]
+        self.productos = productos
+        self.codigos = productos.to_numpy()
+        self.metrica = metrica
+        self.factores = np.ascontiguousarray(factores)
+        self.indice = crear_indice(self.factores, busqueda)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    # Buscar los N complementos de las posiciones dadas, excluyendo el propio producto.
+    # Las filas pueden traer huecos con índice -1 si hay menos de N candidatos
+    def puntuar(self, posiciones, N=5):
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        return self.indice.buscar(self.factores[posiciones], N, excluir=posiciones)
+
+    # Complementos con puntaje para una lista de COD_PRODUCTO.
+    # Devuelve ({COD_PRODUCTO: [(COD_PRODUCTO complemento, puntaje), ...]}, [códigos que no están en el modelo])
+    def complementos(self, productos_ids, N=5):
+        posiciones = self.productos.get_indexer(productos_ids)
+        faltantes = [producto_id for producto_id, posicion in zip(productos_ids, posiciones) if posicion < 0]
+        encontrados = [(producto_id, posicion) for producto_id, posicion in zip(productos_ids, posiciones) if posicion >= 0]
+        resultado = {}
+        if encontrados:
+            indices, puntajes = self.puntuar([posicion for _, posicion in encontrados], N)
+            for (producto_id, _), fila, valores in zip(encontrados, indices, puntajes):
+                validos = fila >= 0
+                resultado[producto_id] = list(zip(self.codigos[fila[validos]].tolist(), valores[validos].tolist()))
+        return resultado, faltantes
+
+
+# Obtener el motor de similitud de un modelo, construyéndolo solo la primera vez por métrica y búsqueda
+def motor_similitud(productos, als_model, metrica='coseno', busqueda='auto'):
+    with _lock_motores:
+        motores_modelo = _motores.setdefault(als_model, {})
+        if (metrica, busqueda) not in motores_modelo:
+            motores_modelo[(metrica, busqueda)] = MotorSimilitud(productos, als_model.item_factors, metrica, busqueda)
+        return motores_modelo[(metrica, busqueda)]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from instrumentacion import medido
+
+# Agregados de ventas_mensuales.csv por producto, calculados una sola vez al cargar el archivo.
+# El resumen de combos se obtiene con un join vectorizado contra esta tabla en lugar de filtrar
+# df_ventas para cada producto de cada combo.
+
+METRICAS_VENTAS = ['Cantidad Vendida', 'Precio Total', 'Costo total']
+ESTADISTICOS = ['mean', 'sum', 'count', 'std']
+
+# Media, suma, conteo y desviación de cada métrica por COD_PRODUCTO (y por mes si se indica columna_mes).
+# Las columnas quedan como '<métrica>_<estadístico>', más 'meses' con el número de filas del producto
+@medido()
+def agregar_ventas_por_producto(df_ventas, columna_mes=None):
+    claves = ['COD_PRODUCTO'] + ([columna_mes] if columna_mes else [])
+    grupos = df_ventas.groupby(claves, observed=True, sort=True)
+    agregados = grupos[METRICAS_VENTAS].agg(ESTADISTICOS)
+    agregados.columns = [f'{metrica}_{estadistico}' for metrica, estadistico in agregados.columns]
+    agregados['meses'] = grupos.size()
+    return agregados
+
+# Estimar cantidad, venta y ganancia mensual de cada combo sumando las medias de sus dos productos.
+# 'con_datos' indica si ambos productos tienen ventas registradas
+@medido()
+def resumir_combos(combos, agregados):
+    a = agregados.reindex(combos['COD_PRODUCTO_A'].to_numpy())
+    b = agregados.reindex(combos['COD_PRODUCTO_B'].to_numpy())
+
+    def media(tabla, metrica):
+        return tabla[f'{metrica}_mean'].to_numpy(dtype=np.float64)
+
+    return pd.DataFrame({
+        'Combo': (combos['Producto A'].astype(str) + ' + ' + combos['Producto B'].astype(str)).to_numpy(),
+        'cantidad_estimada': media(a, 'Cantidad Vendida') + media(b, 'Cantidad Vendida'),
+        'venta_estimada': media(a, 'Precio Total') + media(b, 'Precio Total'),
+        'ganancia_estimada': (media(a, 'Precio Total') - media(a, 'Costo total'))
+                             + (media(b, 'Precio Total') - media(b, 'Costo total')),
+        'con_datos': (a['meses'].fillna(0).to_numpy() > 0) & (b['meses'].fillna(0).to_numpy() > 0)
+    }, index=combos.index)
+
+# Dar formato de texto con separadores de miles al resumen para mostrarlo
+def formatear_resumen(resumen):
+    return pd.DataFrame({
+        'Combo': resumen['Combo'],
+        'Cantidad estimada de venta': resumen['cantidad_estimada'].map("{:,.0f}".format),
+        'Venta estimada ($)': resumen['venta_estimada'].map("{:,.0f}".format),
+        'Ganancia estimada ($)': resumen['ganancia_estimada'].map("{:,.0f}".format)
+    }).reset_index(drop=True)